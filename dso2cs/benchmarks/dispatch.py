@@ -0,0 +1,159 @@
+#! /usr/bin/env python3
+
+'''
+Micro-benchmark of the opcode dispatch of codec.Decoding. Dispatches every instruction of the given files to routines that
+do nothing, the way decode used to (dictionary lookup of the unbound routine, looked up again to record it, invalid opcodes
+caught as KeyError) and the way it does now (list of routines indexed once, invalid opcodes checked explicitly). A list of
+bound routines is timed too, for reference
+
+Usage, from dso2cs directory: python -m benchmarks.dispatch FILE_NAME [FILE_NAME ...]
+'''
+
+import argparse
+
+from collections import deque
+from pathlib import Path
+from time import perf_counter
+
+from core import dso, codec
+
+'''
+Routine that does nothing, standing for opcode routines
+'''
+def noop(self):
+    pass
+
+'''
+Dispatches opcodes through a dictionary of unbound routines
+@param  opcodes     List of opcodes
+@param  obj         Object routines are called on
+@param  callOp      Dictionary of routines by opcode
+@param  endCtrlCode Opcode that ends dispatching
+@param  history     Deque to record routines called to
+'''
+def dispatchDict(opcodes, obj, callOp, endCtrlCode, history):
+    for opCode in opcodes:
+        try:
+            callOp[opCode](obj)
+            history.append(callOp[opCode])
+        except KeyError:
+            if opCode == endCtrlCode:
+                return
+            raise
+
+'''
+Dispatches opcodes through a list of unbound routines
+@param  opcodes     List of opcodes
+@param  obj         Object routines are called on
+@param  calls       List of routines by opcode (None for opcodes without routine)
+@param  endCtrlCode Opcode that ends dispatching
+@param  history     Deque to record routines called to
+'''
+def dispatchList(opcodes, obj, calls, endCtrlCode, history):
+    count = len(calls)
+    for opCode in opcodes:
+        call = calls[opCode] if opCode < count else None
+        if call is None:
+            if opCode == endCtrlCode:
+                return
+            raise ValueError("Invalid opcode: {}".format(opCode))
+
+        call(obj)
+        history.append(call)
+
+'''
+Dispatches opcodes through a list of bound routines
+@param  opcodes     List of opcodes
+@param  calls       List of routines by opcode (None for opcodes without routine)
+@param  boundCalls  List of bound routines by opcode
+@param  endCtrlCode Opcode that ends dispatching
+@param  history     Deque to record routines called to
+'''
+def dispatchBound(opcodes, calls, boundCalls, endCtrlCode, history):
+    count = len(calls)
+    for opCode in opcodes:
+        call = boundCalls[opCode] if opCode < count else None
+        if call is None:
+            if opCode == endCtrlCode:
+                return
+            raise ValueError("Invalid opcode: {}".format(opCode))
+
+        call()
+        history.append(calls[opCode])
+
+'''
+Times a dispatch function, keeping the best of a few runs
+@param  dispatch    Dispatch function
+@param  args        Arguments of dispatch function
+@param  repeat      Number of runs
+@return float       Best time, in seconds
+'''
+def best(dispatch, args, repeat):
+    times = []
+    for _ in range(0, repeat):
+        start = perf_counter()
+        dispatch(*args)
+        times.append(perf_counter() - start)
+
+    return min(times)
+
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Time opcode dispatch of codec.Decoding, before and after flat tables")
+
+    parser.add_argument(
+        "fnames",
+        metavar="FILE_NAME",
+        type=str,
+        nargs="+",
+        help="name of DSO file to take instructions from"
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        metavar="N",
+        type=int,
+        default=20,
+        help="number of runs to keep the best of (default 20)"
+    )
+    parser.add_argument(
+        "--scale",
+        dest="scale",
+        metavar="N",
+        type=int,
+        default=100,
+        help="number of times instructions of each file are dispatched per run (default 100)"
+    )
+
+    opt = parser.parse_args()
+
+    return opt.fnames, opt.repeat, opt.scale
+
+
+def main():
+    fnames, repeat, scale = getArgs()
+
+    for path in [Path(f) for f in fnames]:
+        myFile = dso.File(path)
+        myFile.parse()
+        decoder = codec.Decoding(myFile)
+        endCtrlCode = myFile.byteCode.endCtrlCode
+
+        # Opcodes of the file, without whatever ends decoding, repeated so runs are long enough to time:
+        opcodes = [ opCode for opCode in decoder.instructions.opcodes if opCode in decoder.callOp ] * scale
+
+        callOp = { opCode: noop for opCode in decoder.callOp }
+        calls = [ noop if call is not None else None for call in decoder.calls ]
+        boundCalls = [ call.__get__(decoder) if call is not None else None for call in calls ]
+
+        before = best(dispatchDict, (opcodes, decoder, callOp, endCtrlCode, deque(maxlen=2)), repeat)
+        after = best(dispatchList, (opcodes, decoder, calls, endCtrlCode, deque(maxlen=2)), repeat)
+        bound = best(dispatchBound, (opcodes, calls, boundCalls, endCtrlCode, deque(maxlen=2)), repeat)
+
+        print("{}: {} instructions, ns/instruction: dictionary {:.1f}, list {:.1f} ({:+.0%}), bound list {:.1f} ({:+.0%})".format(
+            path.name, len(opcodes), before / len(opcodes) * 1e9, after / len(opcodes) * 1e9, after / before - 1,
+            bound / len(opcodes) * 1e9, bound / before - 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+#! /usr/bin/env python3
+
+'''
+Generator of synthetic DSO files (version 41), for benchmarking without game files. Generated scripts declare functions with
+nested ifs and while loops, create objects with fields and run some top-level code, laid out the way dso.File.parse expects:
+string and float tables, bytecode (with extension control codes for big values) and ident table
+
+Usage, from dso2cs directory: python -m benchmarks.generator OUT_FILE [--functions N] [--objects N] [--strings N] [--depth N]
+'''
+
+import argparse
+
+from pathlib import Path
+from struct import Struct
+
+from core.opcodes import opByName
+
+# Layout of values in the file:
+uint32 = Struct("<I")
+float64 = Struct("<d")
+
+'''
+Assembler of DSO files: collects codes (opcodes and their operands), string and float tables, and resolves jump labels and
+ident table on build
+'''
+class Assembler:
+    '''
+    Constructs an Assembler object
+    '''
+    def __init__(self):
+        # Codes, as (kind, value): "code" (plain code), "ident" (global string patched in), "ref" (code index of label) or
+        # "label" (marks position of label, takes no code):
+        self.items = []
+
+        # String tables, as offsets by string and raw table:
+        self.globalStrings = {}
+        self.globalTable = bytearray()
+        self.functionStrings = {}
+        self.functionTable = bytearray()
+
+        # Float tables:
+        self.globalFloats = []
+        self.functionFloats = []
+
+        # Indicates if code being assembled is inside a function (which has its own tables):
+        self.inFunction = False
+
+        # Number of labels created so far:
+        self.labels = 0
+
+        # Offset 0 is an empty string (used for missing namespaces and the like):
+        self.addGlobalString("")
+
+    '''
+    Adds a string to the global string table, if not there yet
+    @param  string  String to be added
+    @return int     Offset of string
+    '''
+    def addGlobalString(self, string):
+        if string not in self.globalStrings:
+            self.globalStrings[string] = len(self.globalTable)
+            self.globalTable += string.encode() + b"\x00"
+
+        return self.globalStrings[string]
+
+    '''
+    Adds a string to the function string table, if not there yet
+    @param  string  String to be added
+    @return int     Offset of string
+    '''
+    def addFunctionString(self, string):
+        if string not in self.functionStrings:
+            self.functionStrings[string] = len(self.functionTable)
+            self.functionTable += string.encode() + b"\x00"
+
+        return self.functionStrings[string]
+
+    '''
+    Appends an instruction
+    @param  name        Name of opcode
+    @param  operands    Operands, as items (see ident, literal, floating, label and ref)
+    '''
+    def op(self, name, *operands):
+        self.items.append(("code", opByName[name]))
+        self.items.extend(operands)
+
+    '''
+    Operand referring to a symbol (global string patched in)
+    @param  string  Symbol
+    '''
+    def ident(self, string):
+        return ("ident", string)
+
+    '''
+    Operand referring to a string literal, in the table of current scope
+    @param  string  String literal
+    '''
+    def literal(self, string):
+        if self.inFunction:
+            return ("code", self.addFunctionString(string))
+
+        return ("code", self.addGlobalString(string))
+
+    '''
+    Operand referring to a float, in the table of current scope
+    @param  value   Float
+    '''
+    def floating(self, value):
+        table = self.functionFloats if self.inFunction else self.globalFloats
+        if value not in table:
+            table.append(value)
+
+        return ("code", table.index(value))
+
+    '''
+    Operand holding a plain code
+    @param  value   Code
+    '''
+    def code(self, value):
+        return ("code", value)
+
+    '''
+    Creates a new label
+    @return str     Name of label
+    '''
+    def label(self):
+        self.labels += 1
+        return "L{}".format(self.labels)
+
+    '''
+    Operand referring to the code index of a label
+    @param  label   Name of label
+    '''
+    def ref(self, label):
+        return ("ref", label)
+
+    '''
+    Places a label at current position
+    @param  label   Name of label
+    '''
+    def place(self, label):
+        self.items.append(("label", label))
+
+    '''
+    Builds the DSO file
+    @param  version Version of file (default 41)
+    @return bytes   Contents of file
+    '''
+    def build(self, version=41):
+        # Code index of every label:
+        labels = {}
+        idx = 0
+        for kind, value in self.items:
+            if kind == "label":
+                labels[value] = idx
+            else:
+                idx += 1
+
+        # Encode codes, leaving a placeholder byte where strings are patched in:
+        codes = bytearray()
+        idents = {}
+        idx = 0
+        for kind, value in self.items:
+            if kind == "label":
+                continue
+            elif kind == "ident":
+                idents.setdefault(self.addGlobalString(value), []).append(idx)
+                codes.append(0)
+            else:
+                if kind == "ref":
+                    value = labels[value]
+
+                if value < 0xff:
+                    codes.append(value)
+                else:
+                    codes.append(0xff)
+                    codes += uint32.pack(value)
+            idx += 1
+
+        out = bytearray(uint32.pack(version))
+        for table in (self.globalTable, self.functionTable):
+            out += uint32.pack(len(table)) + table
+        for table in (self.globalFloats, self.functionFloats):
+            out += uint32.pack(len(table))
+            for value in table:
+                out += float64.pack(value)
+
+        # Bytecode (no line break pairs):
+        out += uint32.pack(idx) + uint32.pack(0) + codes
+
+        # Ident table:
+        out += uint32.pack(len(idents))
+        for offset, locations in idents.items():
+            out += uint32.pack(offset) + uint32.pack(len(locations))
+            for location in locations:
+                out += uint32.pack(location)
+
+        return bytes(out)
+
+
+'''
+Assembles an assignment of a string literal to a variable
+@param  asm         Assembler
+@param  variable    Name of variable
+@param  string      String literal
+'''
+def assignString(asm, variable, string):
+    asm.op("OP_LOADIMMED_STR", asm.literal(string))
+    asm.op("OP_SETCURVAR_CREATE", asm.ident(variable))
+    asm.op("OP_SAVEVAR_STR")
+    asm.op("OP_STR_TO_NONE")
+
+'''
+Assembles a function call whose result is discarded
+@param  asm         Assembler
+@param  name        Name of function
+@param  argv        Arguments (variables, if prefixed with $ or %, string literals otherwise)
+@param  namespace   Namespace of function (default None)
+'''
+def callFunction(asm, name, argv, namespace=None):
+    asm.op("OP_PUSH_FRAME")
+    for arg in argv:
+        if arg[0] in "$%":
+            asm.op("OP_SETCURVAR", asm.ident(arg))
+            asm.op("OP_LOADVAR_STR")
+        else:
+            asm.op("OP_LOADIMMED_STR", asm.literal(arg))
+        asm.op("OP_PUSH")
+    asm.op("OP_CALLFUNC", asm.ident(name), asm.ident(namespace) if namespace else asm.code(0), asm.code(0))
+    asm.op("OP_STR_TO_NONE")
+
+'''
+Assembles an assignment of the sum of two variables
+@param  asm     Assembler
+@param  target  Name of variable assigned to
+@param  left    Name of first variable
+@param  right   Name of second variable
+'''
+def assignSum(asm, target, left, right):
+    asm.op("OP_SETCURVAR", asm.ident(left))
+    asm.op("OP_LOADVAR_FLT")
+    asm.op("OP_SETCURVAR", asm.ident(right))
+    asm.op("OP_LOADVAR_FLT")
+    asm.op("OP_ADD")
+    asm.op("OP_SETCURVAR_CREATE", asm.ident(target))
+    asm.op("OP_SAVEVAR_FLT")
+    asm.op("OP_FLT_TO_NONE")
+
+'''
+Assembles an increment of a variable (var++)
+@param  asm         Assembler
+@param  variable    Name of variable
+'''
+def increment(asm, variable):
+    asm.op("OP_LOADIMMED_FLT", asm.floating(1.0))
+    asm.op("OP_SETCURVAR_CREATE", asm.ident(variable))
+    asm.op("OP_LOADVAR_FLT")
+    asm.op("OP_ADD")
+    asm.op("OP_SAVEVAR_FLT")
+    asm.op("OP_FLT_TO_NONE")
+
+'''
+Assembles a comparison of a variable against a float, leaving the result for a conditional jump
+@param  asm         Assembler
+@param  variable    Name of variable
+@param  value       Float
+'''
+def compareGreater(asm, variable, value):
+    asm.op("OP_LOADIMMED_FLT", asm.floating(value))
+    asm.op("OP_SETCURVAR", asm.ident(variable))
+    asm.op("OP_LOADVAR_FLT")
+    asm.op("OP_CMPGR")
+
+'''
+Assembles a block of statements: an assignment, a call and, while depth allows, an if/else and a while loop with nested
+blocks
+@param  asm     Assembler
+@param  depth   Number of levels of nesting left
+@param  k       Number distinguishing names and values of this block
+'''
+def block(asm, depth, k):
+    prefix = "%" if asm.inFunction else "$"
+    assignString(asm, "{}l{}".format(prefix, k), "text {}\nline".format(k))
+    callFunction(asm, "echo", ["hello {}".format(k), prefix + "x"])
+
+    if depth <= 0:
+        return
+
+    # If/else:
+    elseLabel, endLabel = asm.label(), asm.label()
+    compareGreater(asm, prefix + "x", float(k % 7))
+    asm.op("OP_JMPIFNOT", asm.ref(elseLabel))
+    block(asm, depth - 1, k + 1)
+    asm.op("OP_JMP", asm.ref(endLabel))
+    asm.place(elseLabel)
+    callFunction(asm, "warn", ["else {}".format(k)])
+    asm.place(endLabel)
+
+    # While loop:
+    bodyLabel, endLabel = asm.label(), asm.label()
+    compareGreater(asm, prefix + "i", 10.0)
+    asm.op("OP_JMPIFNOT", asm.ref(endLabel))
+    asm.place(bodyLabel)
+    increment(asm, prefix + "i")
+    if depth > 1:
+        block(asm, depth - 2, k + 2)
+    compareGreater(asm, prefix + "i", 10.0)
+    asm.op("OP_JMPIF", asm.ref(bodyLabel))
+    asm.place(endLabel)
+
+'''
+Assembles a function declaration
+@param  asm         Assembler
+@param  name        Name of function
+@param  namespace   Namespace of function (None for none)
+@param  depth       Nesting depth of its body
+@param  k           Number distinguishing names and values of its body
+'''
+def function(asm, name, namespace, depth, k):
+    endLabel = asm.label()
+    argv = ["%x", "%y"]
+    asm.op("OP_FUNC_DECL", asm.ident(name), asm.ident(namespace) if namespace else asm.code(0), asm.code(0), asm.code(1),
+        asm.ref(endLabel), asm.code(len(argv)), *[asm.ident(arg) for arg in argv])
+
+    asm.inFunction = True
+    assignSum(asm, "%z", "%x", "%y")
+    block(asm, depth, k)
+    callFunction(asm, "getCost", ["%z"], namespace="Research")
+    asm.op("OP_SETCURVAR", asm.ident("%z"))
+    asm.op("OP_LOADVAR_STR")
+    # Compilers emit returns in pairs:
+    asm.op("OP_RETURN")
+    asm.op("OP_RETURN")
+    asm.place(endLabel)
+    asm.inFunction = False
+
+'''
+Assembles creation of an object with a few fields
+@param  asm     Assembler
+@param  k       Number distinguishing name of object
+'''
+def createObject(asm, k):
+    asm.op("OP_PUSH_FRAME")
+    asm.op("OP_LOADIMMED_IDENT", asm.literal("ScriptObject"))
+    asm.op("OP_PUSH")
+    asm.op("OP_LOADIMMED_IDENT", asm.literal("Obj{}".format(k)))
+    asm.op("OP_PUSH")
+
+    endLabel = asm.label()
+    asm.op("OP_CREATE_OBJECT", asm.code(0), asm.code(k % 2), asm.code(0), asm.code(0), asm.ref(endLabel))
+    asm.op("OP_ADD_OBJECT", asm.code(0))
+    for field in range(0, 3):
+        asm.op("OP_LOADIMMED_STR", asm.literal("value {}".format(field)))
+        asm.op("OP_SETCUROBJECT_NEW")
+        asm.op("OP_SETCURFIELD", asm.ident("field{}".format(field)))
+        asm.op("OP_SAVEFIELD_STR")
+        asm.op("OP_STR_TO_NONE")
+    asm.op("OP_END_OBJECT", asm.code(0))
+    asm.place(endLabel)
+
+'''
+Generates a DSO file
+@param  functions   Number of functions (default 5)
+@param  objects     Number of objects (default 3)
+@param  strings     Number of extra strings in global string table (default 50)
+@param  depth       Nesting depth of function bodies (default 3)
+@return bytes       Contents of file
+'''
+def generate(functions=5, objects=3, strings=50, depth=3):
+    asm = Assembler()
+
+    for idx in range(0, strings):
+        asm.addGlobalString("$pad{}".format(idx))
+
+    for idx in range(0, functions):
+        function(asm, "fn{}".format(idx), "NS{}".format(idx % 3) if idx % 2 else None, depth, idx)
+
+    for idx in range(0, objects):
+        createObject(asm, idx)
+
+    assignString(asm, "$x", "top")
+    callFunction(asm, "fn0", ["1", "2"])
+    asm.op("OP_RETURN")
+
+    return asm.build()
+
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Generate a synthetic DSO file (version 41)")
+
+    parser.add_argument(
+        "out",
+        metavar="OUT_FILE",
+        type=str,
+        help="name of the file to be generated"
+    )
+    parser.add_argument("--functions", dest="functions", metavar="N", type=int, default=5, help="number of functions")
+    parser.add_argument("--objects", dest="objects", metavar="N", type=int, default=3, help="number of objects")
+    parser.add_argument("--strings", dest="strings", metavar="N", type=int, default=50, help="number of extra global strings")
+    parser.add_argument("--depth", dest="depth", metavar="N", type=int, default=3, help="nesting depth of functions")
+
+    opt = parser.parse_args()
+
+    return opt.out, opt.functions, opt.objects, opt.strings, opt.depth
+
+
+def main():
+    out, functions, objects, strings, depth = getArgs()
+    Path(out).write_bytes(generate(functions, objects, strings, depth))
+
+
+if __name__ == "__main__":
+    main()
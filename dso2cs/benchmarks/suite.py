@@ -0,0 +1,209 @@
+#! /usr/bin/env python3
+
+'''
+Benchmark suite: times each stage of decompilation (dso.File.parseSections, dso.File.patchStrings, codec.Decoding.decode and
+torque.Tree.format) on synthetic DSO files of several scales, plus any given files, and records results as JSON. Given the
+results of a previous run, reports stages that got slower
+
+Usage, from dso2cs directory: python -m benchmarks.suite [FILE_NAME ...] [--output FILE] [--baseline FILE]
+'''
+
+import argparse
+import json
+import platform
+
+from io import StringIO
+from pathlib import Path
+from sys import stdout
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from core import __version__, dso, codec
+from benchmarks.generator import generate
+
+'''
+Synthetic cases, as parameters of generator.generate by name
+'''
+cases = {
+    "small":    {"functions": 5,   "objects": 3,  "strings": 50,    "depth": 3},
+    "medium":   {"functions": 50,  "objects": 20, "strings": 1000,  "depth": 4},
+    "large":    {"functions": 300, "objects": 50, "strings": 20000, "depth": 5},
+}
+
+'''
+Stages of decompilation, in order
+'''
+stages = ["parse", "patchStrings", "decode", "format"]
+
+'''
+Times every stage of decompilation of a file, once
+@param  path    Path of file
+@return dict    Time, in seconds, by stage and number of instructions decoded
+'''
+def run(path):
+    times = {}
+
+    myFile = dso.File(path)
+
+    start = perf_counter()
+    myFile.parseSections()
+    times["parse"] = perf_counter() - start
+
+    start = perf_counter()
+    myFile.patchStrings()
+    times["patchStrings"] = perf_counter() - start
+
+    start = perf_counter()
+    decoder = codec.Decoding(myFile)
+    decoder.decode()
+    times["decode"] = perf_counter() - start
+
+    start = perf_counter()
+    decoder.tree.rewind()
+    decoder.tree.format(sink=StringIO())
+    times["format"] = perf_counter() - start
+
+    return times, decoder.callStack.total
+
+'''
+Benchmarks a file, keeping the best time of each stage
+@param  path    Path of file
+@param  repeat  Number of runs
+@return dict    Results of file
+'''
+def benchmark(path, repeat):
+    best = {}
+    for _ in range(0, repeat):
+        times, instructions = run(path)
+        for stage in stages:
+            best[stage] = min(best.get(stage, times[stage]), times[stage])
+
+    return {
+        "bytes": path.stat().st_size,
+        "instructions": instructions,
+        "stages": best
+    }
+
+'''
+Compares results against the results of a previous run
+@param  results     Results of this run
+@param  baseline    Results of previous run
+@param  tolerance   Fraction a stage may get slower by before being reported
+@return list        List of (case, stage, ratio) of stages that got slower
+'''
+def compare(results, baseline, tolerance):
+    slower = []
+    for case, result in results["cases"].items():
+        previous = baseline["cases"].get(case)
+        if previous is None:
+            continue
+
+        for stage in stages:
+            before = previous["stages"].get(stage)
+            if before:
+                ratio = result["stages"][stage] / before
+                print("{:<16} {:<14} {:>10.4f}s {:>10.4f}s {:>+8.1%}".format(
+                    case, stage, before, result["stages"][stage], ratio - 1))
+                if ratio > 1 + tolerance:
+                    slower.append((case, stage, ratio))
+
+    return slower
+
+
+def getArgs():
+    parser = argparse.ArgumentParser(description="Time stages of decompilation on synthetic and given DSO files")
+
+    parser.add_argument(
+        "fnames",
+        metavar="FILE_NAME",
+        type=str,
+        nargs="*",
+        help="name of a DSO file to benchmark too"
+    )
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        metavar="NAME",
+        action="append",
+        choices=list(cases),
+        help="synthetic case to run (default all: {})".format(", ".join(cases))
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        metavar="N",
+        type=int,
+        default=3,
+        help="number of runs to keep the best time of each stage of (default 3)"
+    )
+    parser.add_argument(
+        "--output",
+        dest="output",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help="write JSON results to FILE (default stdout)"
+    )
+    parser.add_argument(
+        "--baseline",
+        dest="baseline",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help="compare against JSON results of a previous run, exit with status 1 if a stage got slower"
+    )
+    parser.add_argument(
+        "--tolerance",
+        dest="tolerance",
+        metavar="FRACTION",
+        type=float,
+        default=0.1,
+        help="fraction a stage may get slower by before being reported (default 0.1)"
+    )
+
+    opt = parser.parse_args()
+
+    return opt.fnames, opt.cases or list(cases), opt.repeat, opt.output, opt.baseline, opt.tolerance
+
+
+def main():
+    fnames, names, repeat, output, baseline, tolerance = getArgs()
+
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "cases": {}
+    }
+
+    with TemporaryDirectory() as tmp:
+        for name in names:
+            path = Path(tmp) / (name + ".cs.dso")
+            path.write_bytes(generate(**cases[name]))
+
+            results["cases"][name] = benchmark(path, repeat)
+            results["cases"][name]["params"] = cases[name]
+
+    for path in [Path(f) for f in fnames]:
+        results["cases"][path.name] = benchmark(path, repeat)
+
+    if output is None:
+        json.dump(results, stdout, indent=4)
+        print()
+    else:
+        with open(output, "w") as fd:
+            json.dump(results, fd, indent=4)
+
+    if baseline is not None:
+        with open(baseline) as fd:
+            slower = compare(results, json.load(fd), tolerance)
+
+        for case, stage, ratio in slower:
+            print("Slower: {}: {}: {:+.1%}".format(case, stage, ratio - 1))
+
+        if slower:
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# Version of the decompiler, bump it whenever decompiled output changes (invalidates cached decompilations):
+__version__ = "0.2.0"
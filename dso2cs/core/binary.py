@@ -1,4 +1,24 @@
-from struct import pack, unpack
+from struct import Struct
+
+'''
+Precompiled structures for unpacking values, by endianess
+'''
+structs = {
+    "little": {
+        "uint8":    Struct("<B"),
+        "uint16":   Struct("<H"),
+        "uint32":   Struct("<I"),
+        "float32":  Struct("<f"),
+        "float64":  Struct("<d")
+    },
+    "big": {
+        "uint8":    Struct(">B"),
+        "uint16":   Struct(">H"),
+        "uint32":   Struct(">I"),
+        "float32":  Struct(">f"),
+        "float64":  Struct(">d")
+    }
+}
 
 '''
 Generic methods for manipulating byte streams
@@ -73,12 +93,37 @@ class Reading():
 
         return byteStream
 
+    '''
+    Unpacks a value at the reading pointer, then moves the pointer past it
+    @param  st      Precompiled struct.Struct describing the value
+    @return value   Value unpacked
+    '''
+    def unpackStruct(self, st):
+        pointer = self.pointer
+        if pointer + st.size > len(self.byteStream):
+            raise IndexError("Index out of range")
+
+        self.pointer = pointer + st.size
+
+        return st.unpack_from(self.byteStream, pointer)[0]
+
+    '''
+    The same as unpackStruct, but without moving the reading pointer
+    @param  st      Precompiled struct.Struct describing the value
+    @return value   Value looked up
+    '''
+    def lookupStruct(self, st):
+        if self.pointer + st.size > len(self.byteStream):
+            raise IndexError("Index out of range")
+
+        return st.unpack_from(self.byteStream, self.pointer)[0]
+
     '''
     Reads a byte and unpacks it into an unsigned integer
     @return int 8-bits long unsigned integer
     '''
     def unpackUint8(self):
-        return int.from_bytes(self.read8(), byteorder=self.endian, signed=False)
+        return self.unpackStruct(structs[self.endian]["uint8"])
 
     '''
     Reads two bytes and unpacks it into an unsigned integer
@@ -86,9 +131,9 @@ class Reading():
     '''
     def unpackUint16(self, endian=None):
         if endian is None:
-            return int.from_bytes(self.read16(), byteorder=self.endian, signed=False)
+            return self.unpackStruct(structs[self.endian]["uint16"])
         else:
-            return int.from_bytes(self.read16(), byteorder=endian, signed=False)
+            return self.unpackStruct(structs[endian]["uint16"])
 
     '''
     Reads four bytes and unpacks it into an unsigned integer
@@ -96,14 +141,9 @@ class Reading():
     '''
     def unpackUint32(self, endian=None):
         if endian is None:
-            return int.from_bytes(self.read32(), byteorder=self.endian, signed=False)
+            return self.unpackStruct(structs[self.endian]["uint32"])
         else:
-            return int.from_bytes(self.read32(), byteorder=endian, signed=False)
-
-    structEndian = {
-        "little":   "<",
-        "big":      ">"
-    }
+            return self.unpackStruct(structs[endian]["uint32"])
 
     '''
     Reads four bytes and unpacks it into a float
@@ -111,15 +151,19 @@ class Reading():
     '''
     def unpackFloat32(self, endian=None):
         if endian is None:
-            return unpack(self.structEndian[self.endian] + "f", self.read32())[0]
+            return self.unpackStruct(structs[self.endian]["float32"])
         else:
-            return unpack(self.structEndian[endian] + "f", self.read32())[0]
+            return self.unpackStruct(structs[endian]["float32"])
 
+    '''
+    Reads eight bytes and unpacks it into a float
+    @return int 64-bits long float
+    '''
     def unpackFloat64(self, endian=None):
         if endian is None:
-            return unpack(self.structEndian[self.endian] + "d", self.read64())[0]
+            return self.unpackStruct(structs[self.endian]["float64"])
         else:
-            return unpack(self.structEndian[endian] + "d", self.read32())[0]
+            return self.unpackStruct(structs[endian]["float64"])
 
 
     '''
@@ -155,9 +199,9 @@ class Reading():
     '''
     def lookupUnpackUint8(self, endian=None):
         if endian is None:
-            return int.from_bytes(self.lookup8(), byteorder=self.endian, signed=False)
+            return self.lookupStruct(structs[self.endian]["uint8"])
         else:
-            return int.from_bytes(self.lookup8(), byteorder=endian, signed=False)
+            return self.lookupStruct(structs[endian]["uint8"])
 
     '''
     Lookus up two bytes and unpacks them into an unsigned integer
@@ -165,9 +209,9 @@ class Reading():
     '''
     def lookupUnpackUint16(self, endian=None):
         if endian is None:
-            return int.from_bytes(self.lookup16(), byteorder=self.endian, signed=False)
+            return self.lookupStruct(structs[self.endian]["uint16"])
         else:
-            return int.from_bytes(self.lookup16(), byteorder=endian, signed=False)
+            return self.lookupStruct(structs[endian]["uint16"])
 
     '''
     Appends data to the end of the stream
@@ -192,3 +236,47 @@ class Reading():
     '''
     def insert(self, idx, data, discard=0):
         self.byteStream = self.byteStream[:idx] + data + self.byteStream[idx+discard:]
+
+
+'''
+Read-only byte stream reader backed by a memoryview, so that values are unpacked in place instead of being sliced out first
+'''
+class MemoryReading(Reading):
+    '''
+    Constructs a MemoryReading object
+    @param  byteStream  Byte stream to be processed (any object supporting the buffer protocol)
+    @param  endian      Endianess of byte stream
+    '''
+    def __init__(self, byteStream, endian):
+        # Inherit all characteristics of Reading:
+        super().__init__(memoryview(byteStream), endian)
+
+    '''
+    Reads bytes from byte stream
+    @param  n       Number of bytes to be read
+    @return bytes   Bytes read
+    '''
+    def read(self, n):
+        rd = self.lookup(n)
+
+        self.pointer += n
+
+        return rd
+
+    '''
+    The same as read, but without moving the reading pointer
+    @param  n       Number of bytes to be looked up
+    @return bytes   Bytes looked up
+    '''
+    def lookup(self, n):
+        if self.pointer + n > len(self.byteStream):
+            raise IndexError("Index out of range")
+
+        # Only the requested bytes are copied out of the view:
+        return self.byteStream[self.pointer:self.pointer+n].tobytes()
+
+    '''
+    Releases the underlying view (the reader must not be used afterwards)
+    '''
+    def release(self):
+        self.byteStream.release()
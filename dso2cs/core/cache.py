@@ -0,0 +1,117 @@
+from hashlib import sha256
+from os import environ, getpid, replace, remove
+from pathlib import Path
+from time import time
+import logging
+
+from core import __version__
+
+'''
+Default directory of the cache
+'''
+defaultPath = Path(environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "dso2cs"
+
+'''
+On-disk cache of decompiled files, addressed by the name and content of the DSO file and the version of the decompiler.
+Entries are files named after their key, and their modification time is refreshed on every hit so eviction drops least
+recently used entries first
+'''
+class Cache:
+    '''
+    Constructs a Cache object
+    @param  path        Directory of the cache (default defaultPath)
+    @param  maxSize     Maximum size, in bytes, of all entries (default no limit)
+    @param  maxAge      Maximum age, in seconds, of an entry since last use (default no limit)
+    '''
+    def __init__(self, path=defaultPath, maxSize=None, maxAge=None):
+        self.path = Path(path)
+        self.maxSize = maxSize
+        self.maxAge = maxAge
+
+    '''
+    Computes the key of a DSO file. The name is part of it, as decompiled files start with it
+    @param  name    Name of DSO file
+    @param  data    Contents of DSO file
+    '''
+    def key(self, name, data):
+        digest = sha256(__version__.encode())
+        digest.update(b"\x00")
+        digest.update(name.encode())
+        digest.update(b"\x00")
+        digest.update(data)
+        return digest.hexdigest()
+
+    '''
+    Retrieves path of an entry
+    @param  key     Key of entry
+    '''
+    def getEntryPath(self, key):
+        return self.path / key[:2] / (key + ".cs")
+
+    '''
+    Retrieves a decompiled file
+    @param  key     Key of entry
+    @return bytes   Decompiled file (None if not cached)
+    '''
+    def get(self, key):
+        entry = self.getEntryPath(key)
+        try:
+            output = entry.read_bytes()
+            # Mark entry as recently used:
+            entry.touch()
+        except OSError:
+            return None
+
+        return output
+
+    '''
+    Stores a decompiled file
+    @param  key     Key of entry
+    @param  output  Decompiled file
+    '''
+    def put(self, key, output):
+        entry = self.getEntryPath(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so other processes never read partial entries:
+        temporary = entry.with_suffix(".{}.tmp".format(getpid()))
+        temporary.write_bytes(output)
+        replace(temporary, entry)
+
+    '''
+    Removes entries unused for longer than maxAge, then least recently used ones until all fit in maxSize
+    @return int     Number of removed entries
+    '''
+    def evict(self):
+        entries = []
+        for entry in self.path.glob("*/*.cs"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        # Least recently used first:
+        entries.sort()
+
+        now = time()
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for mtime, entrySize, entry in entries:
+            tooOld = self.maxAge is not None and now - mtime > self.maxAge
+            tooBig = self.maxSize is not None and size > self.maxSize
+            if not tooOld and not tooBig:
+                break
+
+            try:
+                remove(entry)
+            except OSError:
+                continue
+
+            size -= entrySize
+            removed += 1
+
+        if removed:
+            logging.debug("Evicted {} entries from cache: {}".format(removed, self.path))
+
+        return removed
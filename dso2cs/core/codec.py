@@ -1,7 +1,10 @@
 from sys import stdout
+from bisect import bisect_left
+from collections import deque
 import logging
 
 from core import dso, torque
+from core.trace import Tracer, LoggingSink
 from core.opcodes import OPCODES, opByName
 
 '''
@@ -90,6 +93,100 @@ class StringStack(list):
         self.pop()
 
 
+'''
+Cache of decoded strings of a string table, represented as a dictionary where the keys are the offsets of the strings and the
+values are dictionaries of decoded strings by encoding
+'''
+class StringCache(dict):
+    '''
+    Constructs a StringCache object
+    @param  table   dso.StringTable whose strings are decoded
+    '''
+    def __init__(self, table):
+        # Inherit all characteristics of a dictionary:
+        super().__init__()
+
+        self.table = table
+
+        # Counters of lookups answered from cache and lookups that had to decode:
+        self.hits = 0
+        self.misses = 0
+
+    '''
+    Retrieves string of the table at given offset, decoded
+    @param  offset      Offset of string to be retrieved
+    @param  encoding    Encoding of the string
+    '''
+    def decode(self, offset, encoding="utf-8"):
+        decoded = self.get(offset)
+
+        if decoded is not None and encoding in decoded:
+            self.hits += 1
+            string = decoded[encoding]
+        else:
+            self.misses += 1
+            # Missing offsets raise KeyError and are not cached:
+            raw = self.table[offset]
+            try:
+                string = raw.decode(encoding)
+            except UnicodeDecodeError as e:
+                # Failures are cached too, so fallbacks do not decode again:
+                string = e
+
+            self.setdefault(offset, {})[encoding] = string
+
+        if isinstance(string, UnicodeDecodeError):
+            raise string.with_traceback(None)
+
+        return string
+
+    '''
+    Replaces string of the table at given offset, invalidating its decoded versions
+    @param  offset      Offset of string to be set
+    @param  string      String to replace with
+    @param  encoding    Encoding of the string
+    '''
+    def encode(self, offset, string, encoding="utf-8"):
+        self.table[offset] = string.encode(encoding)
+        self.pop(offset, None)
+
+
+'''
+History of the last opcode routines called, represented as a ring buffer (deque) of routines, so memory does not grow with
+the size of the file
+'''
+class CallHistory(deque):
+    '''
+    Constructs a CallHistory object
+    @param  size    Number of calls to remember
+    '''
+    def __init__(self, size):
+        # Inherit all characteristics of a deque, bounded:
+        super().__init__(maxlen=size)
+
+        # Byte indexes of the instructions the remembered calls were made for:
+        self.ips = deque(maxlen=size)
+
+        # Number of calls recorded overall:
+        self.total = 0
+
+    '''
+    Records a call
+    @param  ip      Byte index of instruction
+    @param  call    Routine called for it
+    '''
+    def record(self, ip, call):
+        self.append(call)
+        self.ips.append(ip)
+        self.total += 1
+
+    '''
+    Lists remembered calls, oldest first
+    '''
+    def dump(self):
+        return [ "IP: {}: {}".format(ip, call.__name__) for ip, call in zip(self.ips, self) ]
+
+
 '''
 Methods for decoding a DSO file's bytecode
 '''
@@ -98,10 +195,17 @@ class Decoding:
     Constructs a Decoding object
     @param  dsoFile     Parsed dso.File object to be decoded
     @param  inFunction  Indicates if start is inside a function and at which depth (for partial decompilation only)
-    @param  offset      Start offset of bytecode (for partial decompilation only)
-    '''
-    def __init__(self, dsoFile, inFunction=0, offset=0):
+    @param  offset      Byte index of instruction to start decoding from (for partial decompilation only)
+    @param  tracer      trace.Tracer to send decoding steps to (default logs them if DEBUG level is enabled)
+    @param  stream      Stream to format top-level functions to as soon as they end, releasing them from the tree (default
+                        None, keeps the whole tree; the rest of the tree should be flushed to it after decoding)
+    @param  history     Number of last instructions to remember (default 2, the least routines need; more are logged on
+                        failure)
+    @param  profile     profiler.Profile to count and time opcode routines in (default None, does not profile)
+    '''
+    def __init__(self, dsoFile, inFunction=0, offset=0, tracer=None, stream=None, history=2, profile=None):
         self.file = dsoFile
+        self.stream = stream
         self.inFunction = inFunction
         self.in_object = 0 # if inside object, with nesting ++
         self.offset = offset
@@ -126,38 +230,97 @@ class Decoding:
         # Main tree of file:
         self.tree = torque.Tree(torque.File(self.file.name))
         
-        # Stack of opcode calls performed:
-        self.callStack = []
+        # Last opcode calls performed:
+        self.callStack = CallHistory(max(history, 2))
 
         # Instruction pointer:
-        self.ip = 0
+        self.ip = offset
+
+        # Disassembled bytecode, index of next instruction and of next operand to be read:
+        self.instructions = self.file.disassemble()
+        self.next = self.instructions.find(offset) if offset else 0
+        self.operand = 0
+
+        # If last string offset read was patched in:
+        self.patched = False
+
+        # Decoded strings of each string table:
+        self.globalStrings = StringCache(self.file.globalStringTable)
+        self.functionStrings = StringCache(self.file.functionStringTable)
 
         # Dictionary for storing which addresses mark the end of code blocks and from which syntatic structures:
         self.endBlock = {}
 
+        # Tracing is skipped altogether when there is no sink:
+        if tracer is None:
+            tracer = Tracer(LoggingSink()) if logging.getLogger().isEnabledFor(logging.DEBUG) else Tracer()
+        self.tracer = tracer
+
+        # Wrapped routines, only called when profiling (the history keeps the routines themselves, as some routines check
+        # which ones were called before them):
+        self.timedCalls = profile.wrap(self.calls) if profile is not None else None
+
+    '''
+    Retrieves number of instructions decoded so far
+    '''
+    def getInstructionCount(self):
+        return self.callStack.total
+
     '''
     Retrieves next code of bytecode
     '''
     def getCode(self):
-        return self.file.byteCode.getCode()
+        operand = self.operand
+        self.operand = operand + 1
+        return self.instructions.operands[operand]
+
+    '''
+    Retrieves opcode of next instruction and moves to it
+    '''
+    def getInstruction(self):
+        idx = self.next
+        instructions = self.instructions
+
+        # Disassembly stopped before the end of the bytecode:
+        if idx >= len(instructions.opcodes):
+            raise instructions.error
+
+        self.next = idx + 1
+        self.operand = instructions.firsts[idx]
+        return instructions.opcodes[idx]
 
     '''
     Check next code of bytecode without advancing IP
     '''
     def chkNextCode(self):
-        return self.file.byteCode.lookupUnpackUint8()
+        return self.instructions.opcodes[self.next]
+
+    '''
+    Skips next instruction
+    '''
+    def skipInstruction(self):
+        self.next += 1
 
     '''
     Retrieves next data of bytecode as uint
     '''
     def getUint(self):
-        return self.file.byteCode.getUint()
+        return self.getCode()
 
     '''
     Retrieves next data of bytecode as string offset
     '''
     def getStringOffset(self):
-        return self.file.byteCode.getStringOffset()
+        operand = self.operand
+        self.operand = operand + 1
+        kind = self.instructions.kinds[operand]
+        self.patched = kind == self.instructions.PATCHED
+        offset = self.instructions.operands[operand]
+
+        if kind == self.instructions.EXTENDED and self.tracer:
+            self.tracer.emit("String offset {} from control code".format(offset))
+
+        return offset
 
     '''
     Retrieves string value at top of stack. (For compat with compileEval.cc)
@@ -174,7 +337,7 @@ class Decoding:
     @param  encoding    Encoding of the string
     '''
     def getGlobalStringByOffset(self, offset, encoding="utf-8"):
-        return self.file.globalStringTable[offset].decode(encoding)
+        return self.globalStrings.decode(offset, encoding)
 
     '''
     Retrieves next data of bytecode as string offset then retrieves global string at that offset
@@ -189,7 +352,7 @@ class Decoding:
     @param  encoding    Encoding of the string
     '''
     def getFunctionStringByOffset(self, offset, encoding="utf-8"):
-        return self.file.functionStringTable[offset].decode(encoding)
+        return self.functionStrings.decode(offset, encoding)
 
     '''
     Retrieves next data of bytecode as string offset then retrieves function string at that offset
@@ -204,7 +367,8 @@ class Decoding:
     @param  encoding    Encoding of the string
     '''
     def getStringByOffset(self, offset, encoding="utf-8"):
-        if self.file.byteCode.in_patchlocks:
+        # Patched in offsets always refer to the global string table:
+        if self.patched:
             return self.getGlobalStringByOffset(offset, encoding)
         if self.inFunction and self.file.functionStringTable:
             try:
@@ -230,7 +394,7 @@ class Decoding:
     @param  encoding    Encoding of the string
     '''
     def setGlobalString(self, offset, string, encoding="utf-8"):
-        self.file.globalStringTable[offset] = string.encode(encoding)
+        self.globalStrings.encode(offset, string, encoding)
 
     '''
     Replaces function string at given offset by given string
@@ -239,7 +403,7 @@ class Decoding:
     @param  encoding    Encoding of the string
     '''
     def setFunctionString(self, offset, string, encoding="utf-8"):
-        self.file.functionStringTable[offset] = string.encode(encoding)
+        self.functionStrings.encode(offset, string, encoding)
 
     '''
     Replaces string at given offset by given string
@@ -253,11 +417,20 @@ class Decoding:
         else:
             return self.setGlobalString(offset, string, encoding)
 
+    '''
+    Retrieves hit/miss counters of the decoded string caches
+    '''
+    def getStringCacheStats(self):
+        return {
+            "global":   {"hits": self.globalStrings.hits, "misses": self.globalStrings.misses},
+            "function": {"hits": self.functionStrings.hits, "misses": self.functionStrings.misses}
+        }
+
     '''
     Retrieves next data of bytecode as float offset
     '''
     def getFloatOffset(self):
-        return self.file.byteCode.getFloatOffset()
+        return self.getCode()
 
     '''
     Retrieves float of Global Float Table
@@ -312,7 +485,7 @@ class Decoding:
     Retrieves index of next byte to be read
     '''
     def getCurByteIndex(self):
-        return self.file.byteCode.pointer
+        return self.instructions.ips[self.next]
 
     '''
     Records Torque code block structure and its end address
@@ -329,7 +502,7 @@ class Decoding:
     Dumps bytecode of current instruction (assuming all its parameters have been read already)
     '''
     def dumpInstruction(self):
-        return self.file.byteCode.dump(self.ip, self.file.byteCode.pointer)
+        return self.file.byteCode.dump(self.ip, self.getCurByteIndex())
 
     '''
     Routine called for OP_FUNC_DECL (declare a function)
@@ -385,8 +558,9 @@ class Decoding:
         # Indicate flow has entered another function:
         self.inFunction += 1
 
-        logging.debug("IP: {}: {}: Declare function: {}, {}, {}, {}, {}, {}".format(
-            self.ip, self.dumpInstruction(), funcName, namespace, package, hasBody, end, argc))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Declare function: {}, {}, {}, {}, {}, {}".format(
+                self.ip, self.dumpInstruction(), funcName, namespace, package, hasBody, end, argc))
 
     '''
     Routine called for OP_CREATE_OBJECT (create an an object)
@@ -421,8 +595,9 @@ class Decoding:
         self.tree = torque.Tree(torque.ObjCreation(parent, is_dblock, is_internal, is_message, argv))
         self.in_object += 1
         
-        logging.debug("IP: {}: {}: Create object {}: parent {}, {}, end {}".format(
-            self.ip, self.dumpInstruction(), self.in_object, parent, (is_dblock, is_internal, is_message), end))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Create object {}: parent {}, {}, end {}".format(
+                self.ip, self.dumpInstruction(), self.in_object, parent, (is_dblock, is_internal, is_message), end))
 
     '''
     Routine called for OP_ADD_OBJECT (add object to stack)
@@ -440,7 +615,8 @@ class Decoding:
             # Push it to stack:
             self.intStack.append(self.tree.root)
 
-        logging.debug("IP: {}: {}: Add object".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Add object".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_END_OBJECT (end object creation)
@@ -464,7 +640,8 @@ class Decoding:
             self.tree.append(self.intStack.pop())
 
         self.in_object -= 1
-        logging.debug("IP: {}: {}: End object {}".format(self.ip, self.dumpInstruction(), self.in_object))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: End object {}".format(self.ip, self.dumpInstruction(), self.in_object))
 
 
     '''
@@ -474,7 +651,7 @@ class Decoding:
     '''
     def opJmpiffnot(self):
         # Get jump target:
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         # Get branch condition:
         if self.binStack:
@@ -509,7 +686,8 @@ class Decoding:
                 # Replace if by while statement (invert condition):
                 self.tree.replace(torque.While(torque.Not([condition])))
 
-        logging.debug("IP: {}: {}: Jump if float condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if float condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMPIFNOT (jump if condition retrieved from int stack not met)
@@ -518,7 +696,7 @@ class Decoding:
     '''
     def opJmpifnot(self):
         # Get jump target:
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         # Get branch condition:
         if self.binStack:
@@ -553,7 +731,8 @@ class Decoding:
                 # Replace if by while statement (invert condition):
                 self.tree.replace(torque.While(torque.Not([condition])))
 
-        logging.debug("IP: {}: {}: Jump if uint/boolean condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if uint/boolean condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMPIFF (jump if condition retrieved from float stack met)
@@ -562,7 +741,7 @@ class Decoding:
     '''
     def opJmpiff(self):
         # Get jump target:
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         # Get branch condition:
         if self.binStack:
@@ -597,7 +776,8 @@ class Decoding:
                 # Replace if by while statement:
                 self.tree.replace(torque.While(condition))
 
-        logging.debug("IP: {}: {}: Jump if float condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if float condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMPIF (jump if condition retrieved from int stack met)
@@ -606,7 +786,7 @@ class Decoding:
     '''
     def opJmpif(self):
         # Get jump target:
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         # Get branch condition:
         if self.binStack:
@@ -641,7 +821,8 @@ class Decoding:
                 # Replace if by while statement:
                 self.tree.replace(torque.While(condition))
 
-        logging.debug("IP: {}: {}: Jump if uint/boolean condition met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if uint/boolean condition met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMP (jump unconditionally)
@@ -649,7 +830,7 @@ class Decoding:
     Appends either a torque.Else, a torque.Break or a torque.While to the tree
     '''
     def opJmp(self):
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         # If forward jump:
         if target > self.getCurByteIndex():
@@ -674,7 +855,8 @@ class Decoding:
         else:
             raise NotImplementedError("Backward jump not implemented for OP_JMP")
 
-        logging.debug("IP: {}: {}: Jump to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMPIFNOT_NP (jump if boolean condition not met - I believe this is used for && operation short-circuit)
@@ -682,7 +864,7 @@ class Decoding:
     Retrieves a boolean condition from the int stack and appends it as operand of a torque.And operation
     '''
     def opJmpifnotNp(self):
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         if self.binStack:
             # Get previous condition:
@@ -692,7 +874,8 @@ class Decoding:
         else:
             self.binStack.append(torque.And([self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Jump if binary condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if binary condition not met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_JMPIF_NP (jump if boolean condition met - I believe this is used for || operation short-circuit)
@@ -700,7 +883,7 @@ class Decoding:
     Retrieves a boolean condition from the int stack and appends it as operand of a torque.Or operation
     '''
     def opJmpifNp(self):
-        target = self.getByteIndex(self.getCode()) - self.offset
+        target = self.getByteIndex(self.getCode())
 
         if self.binStack:
             # Get previous condition:
@@ -710,7 +893,8 @@ class Decoding:
         else:
             self.binStack.append(torque.Or([self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Jump if binary condition met to: {}".format(self.ip, self.dumpInstruction(), target))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Jump if binary condition met to: {}".format(self.ip, self.dumpInstruction(), target))
 
     '''
     Routine called for OP_RETURN (return from function/script)
@@ -744,14 +928,15 @@ class Decoding:
             if self.chkNextCode() == opByName['OP_RETURN']: 
                 if not isinstance(self.tree.curNode , torque.If):
                     if not isinstance(self.tree.curNode, torque.Else):
-                        self.getCode() # just skip code
+                        self.skipInstruction() # just skip code
                     else:
                         #Fine, but dont repeat last stack value
                         self.strStack.pop()
 
        
 
-        logging.debug("IP: {}: {}: Return".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Return".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPEQ (compare if floats are equal)
@@ -761,7 +946,8 @@ class Decoding:
     def opCmpeq(self):
         self.intStack.append(torque.Equal([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if equal".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if equal".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPLT (compare if a float is less than another one)
@@ -771,7 +957,8 @@ class Decoding:
     def opCmplt(self):
         self.intStack.append(torque.Less([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if less".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if less".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPLE (compare if a float is less than or equal to another one)
@@ -781,7 +968,8 @@ class Decoding:
     def opCmple(self):
         self.intStack.append(torque.LessOrEqual([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if less or equal".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if less or equal".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPGR (compare if a float is greater than another one)
@@ -791,7 +979,8 @@ class Decoding:
     def opCmpgr(self):
         self.intStack.append(torque.Greater([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if greater".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if greater".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPGE (compare if a float is greater than or equal to another one)
@@ -801,7 +990,8 @@ class Decoding:
     def opCmpge(self):
         self.intStack.append(torque.GreaterOrEqual([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if greater or equal".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if greater or equal".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_CMPNE (compare if a float is not equal to another one)
@@ -811,7 +1001,8 @@ class Decoding:
     def opCmpne(self):
         self.intStack.append(torque.NotEqual([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Compare if not equal".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare if not equal".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_XOR (perform a bitwise xor operation between two integers)
@@ -821,7 +1012,8 @@ class Decoding:
     def opXor(self):
         self.intStack.append(torque.Xor([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Bitwise xor".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Bitwise xor".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_MOD (perform a modulo operation between two integers)
@@ -831,7 +1023,8 @@ class Decoding:
     def opMod(self):
         self.intStack.append(torque.Mod([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Get modulo".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Get modulo".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_BITAND (perform a bitwise and operation between two integers)
@@ -841,7 +1034,8 @@ class Decoding:
     def opBitand(self):
         self.intStack.append(torque.BitAnd([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Bitwise and".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Bitwise and".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_BITOR (perform a bitwise or operation between two integers)
@@ -851,7 +1045,8 @@ class Decoding:
     def opBitor(self):
         self.intStack.append(torque.BitOr([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Bitwise or".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Bitwise or".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_NOT (negate an integer)
@@ -861,7 +1056,8 @@ class Decoding:
     def opNot(self):
         self.intStack.append(torque.Not([self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Negate uint/boolean value".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Negate uint/boolean value".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_NOTF (negate a float)
@@ -871,7 +1067,8 @@ class Decoding:
     def opNotf(self):
         self.intStack.append(torque.Not([self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Negate float value".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Negate float value".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_ONESCOMPLEMENT (perform an one's complement operation between two integers)
@@ -881,7 +1078,8 @@ class Decoding:
     def opOnescomplement(self):
         self.intStack.append(torque.Complement([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Bitwise complement".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Bitwise complement".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SHR (shift an integer to the right by another integer value)
@@ -891,7 +1089,8 @@ class Decoding:
     def opShr(self):
         self.intStack.append(torque.ShiftRight([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Shift right".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Shift right".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SHL (shift an integer to the left by another integer value)
@@ -901,7 +1100,8 @@ class Decoding:
     def opShl(self):
         self.intStack.append(torque.ShiftLeft([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Shift left".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Shift left".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_AND (perform a boolean and operation between two integers)
@@ -911,7 +1111,8 @@ class Decoding:
     def opAnd(self):
         self.intStack.append(torque.And([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Logical and".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Logical and".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_OR (perform a boolean or operation between two integers)
@@ -921,7 +1122,8 @@ class Decoding:
     def opOr(self):
         self.intStack.append(torque.Or([self.intStack.pop(), self.intStack.pop()]))
 
-        logging.debug("IP: {}: {}: Logical or".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Logical or".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_ADD (add two floats)
@@ -936,7 +1138,8 @@ class Decoding:
         else:
             self.fltStack.append(torque.Add([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Sum floats".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Sum floats".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SUB (subtract two floats)
@@ -950,7 +1153,8 @@ class Decoding:
         else:
             self.fltStack.append(torque.Sub([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Subtract floats".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Subtract floats".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_MUL (multiply two floats)
@@ -960,7 +1164,8 @@ class Decoding:
     def opMul(self):
         self.fltStack.append(torque.Mul([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Multiply floats".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Multiply floats".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_DIV (divide one float by another)
@@ -970,7 +1175,8 @@ class Decoding:
     def opDiv(self):
         self.fltStack.append(torque.Div([self.fltStack.pop(), self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Divide floats".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Divide floats".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_NEG (invert the sign of a float)
@@ -980,7 +1186,8 @@ class Decoding:
     def opNeg(self):
         self.fltStack.append(torque.Neg([self.fltStack.pop()]))
 
-        logging.debug("IP: {}: {}: Invert sign of float".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Invert sign of float".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SETCURVAR (set name/symbol of current variable)
@@ -1007,7 +1214,8 @@ class Decoding:
         self.curvar = string
         self.curobj = None      # According to T2D compileEval.cc this is a must
 
-        logging.debug("IP: {}: {}: Set current variable: {}".format(self.ip, self.dumpInstruction(), self.curvar))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current variable: {}".format(self.ip, self.dumpInstruction(), self.curvar))
 
     '''
     Routine called for OP_SETCURVAR_CREATE (set name/symbol of current variable)
@@ -1024,7 +1232,8 @@ class Decoding:
         self.curvar = string
         self.curobj = None      # According to T2D compileEval.cc this is a must
 
-        logging.debug("IP: {}: {}: Set current variable (create): {}".format(self.ip, self.dumpInstruction(), self.curvar))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current variable (create): {}".format(self.ip, self.dumpInstruction(), self.curvar))
 
     '''
     Routine called for OP_SETCURVAR_ARRAY and OP_SETCURVAR_ARRAY_CREATE (set name/symbol and index of current array variable)
@@ -1035,7 +1244,8 @@ class Decoding:
         self.curvar = torque.ArrayAccess(self.strStack[-1])     # StringTable->insert(mBuffer + mStart);
         self.curobj = None      # According to T2D compileEval.cc this is a must
 
-        logging.debug("IP: {}: {}: Set current array variable".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current array variable".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SETCURVAR_ARRAY_CREATE (set name/symbol and index of current array variable)
@@ -1048,12 +1258,15 @@ class Decoding:
         # it happens in case of $Array[var++]/$Array[var--]
         arr_ind = self.curvar.operands[1]
         if isinstance(arr_ind, torque.AddPP) or isinstance(arr_ind, torque.AddPP):
-            if arr_ind == self.tree.curNode.children[-1]:
-                self.tree.curNode.children.pop()
+            # Unless children of root were just streamed out, leaving none:
+            if not (self.tree.flushed and self.tree.curNode is self.tree.root and not self.tree.curNode.children):
+                if arr_ind == self.tree.curNode.children[-1]:
+                    self.tree.curNode.children.pop()
 
         self.curobj = None      # According to T2D compileEval.cc this is a must
 
-        logging.debug("IP: {}: {}: Set current array variable".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current array variable".format(self.ip, self.dumpInstruction()))
 
 
     '''
@@ -1064,7 +1277,8 @@ class Decoding:
     def opLoadvarUint(self):
         self.intStack.append(self.curvar)
 
-        logging.debug("IP: {}: {}: Load variable of type uint: {}".format(self.ip, self.dumpInstruction(), self.curvar))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load variable of type uint: {}".format(self.ip, self.dumpInstruction(), self.curvar))
 
     '''
     Routine called for OP_LOADVAR_FLT (load current variable value to float stack)
@@ -1074,7 +1288,8 @@ class Decoding:
     def opLoadvarFlt(self):
         self.fltStack.append(self.curvar)
 
-        logging.debug("IP: {}: {}: Load variable of type float: {}".format(self.ip, self.dumpInstruction(), self.curvar))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load variable of type float: {}".format(self.ip, self.dumpInstruction(), self.curvar))
 
     '''
     Routine called for OP_LOADVAR_STR (load current variable value to string stack)
@@ -1084,7 +1299,8 @@ class Decoding:
     def opLoadvarStr(self):
         self.strStack.load(self.curvar)
 
-        logging.debug("IP: {}: {}: Load variable of type string: {}".format(self.ip, self.dumpInstruction(), self.curvar))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load variable of type string: {}".format(self.ip, self.dumpInstruction(), self.curvar))
 
     '''
     Routine called for OP_SAVEVAR_UINT (save uint value into current variable)
@@ -1099,7 +1315,8 @@ class Decoding:
 
         self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save uint value into variable".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save uint value into variable".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SAVEVAR_FLT (save float value into current variable)
@@ -1118,7 +1335,8 @@ class Decoding:
         else:
             self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save float value into variable".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save float value into variable".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SAVEVAR_STR (save string value into current variable)
@@ -1137,7 +1355,8 @@ class Decoding:
 
         self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save string value into variable".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save string value into variable".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SETCUROBJECT (set name/symbol of current object)
@@ -1147,7 +1366,8 @@ class Decoding:
     def opSetcurobject(self):
         self.curobj = self.getStringValue()
 
-        logging.debug("IP: {}: {}: {}: Set current object to ".format(self.ip, self.dumpInstruction(), self.curobj))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: {}: Set current object to ".format(self.ip, self.dumpInstruction(), self.curobj))
 
     '''
     Routine called for OP_SETCUROBJECT_NEW (unset name/symbol of current object)
@@ -1157,12 +1377,14 @@ class Decoding:
     def opSetcurobjectNew(self):
         self.curobj = None
 
-        logging.debug("IP: {}: {}: Set new current object".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set new current object".format(self.ip, self.dumpInstruction()))
 
     def opSetcurobjectNewInt(self):
         self.curobj = None
 
-        logging.debug("IP: {}: {}: Set new current object".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set new current object".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SETCURFIELD (set name/symbol of current object field)
@@ -1172,7 +1394,8 @@ class Decoding:
     def opSetcurfield(self):
         self.curfield = self.getGlobalString()
 
-        logging.debug("IP: {}: {}: Set current field: {}".format(self.ip, self.dumpInstruction(), self.curfield))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current field: {}".format(self.ip, self.dumpInstruction(), self.curfield))
 
     '''
     Routine called for OP_SETCURVAR_ARRAY (set name/symbol and index of current array field)
@@ -1182,7 +1405,8 @@ class Decoding:
     def opSetcurfieldArray(self):
         self.curfield = torque.ArrayAccess([self.curfield, self.getStringValue()])
 
-        logging.debug("IP: {}: {}: Set current array field".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Set current array field".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_LOADFIELD_UINT (load current field value to int stack)
@@ -1198,7 +1422,8 @@ class Decoding:
 
         self.intStack.append(field)
 
-        logging.debug("IP: {}: {}: Load field of type string: {}".format(self.ip, self.dumpInstruction(), field))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load field of type string: {}".format(self.ip, self.dumpInstruction(), field))
 
     '''
     Routine called for OP_LOADFIELD_FLT (load current field value to float stack)
@@ -1213,7 +1438,8 @@ class Decoding:
             field = self.curfield
         self.fltStack.append(field)
 
-        logging.debug("IP: {}: {}: Load field of type string: {}".format(self.ip, self.dumpInstruction(), field))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load field of type string: {}".format(self.ip, self.dumpInstruction(), field))
 
     '''
     Routine called for OP_LOADFIELD_STR (load current field value to string stack)
@@ -1227,7 +1453,8 @@ class Decoding:
         else:
             self.strStack.load(self.curfield)
 
-        logging.debug("IP: {}: {}: Load field (string): {} from object{}".format(self.ip, self.dumpInstruction(), self.curfield, self.curobj))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load field (string): {} from object{}".format(self.ip, self.dumpInstruction(), self.curfield, self.curobj))
         '''
         case OP_LOADFIELD_STR:
             if(curObject) {
@@ -1259,7 +1486,8 @@ class Decoding:
 
         self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save uint value into field".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save uint value into field".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SAVEFIELD_FLT (save float value into current field)
@@ -1280,7 +1508,8 @@ class Decoding:
 
         self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save float value into field".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save float value into field".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_SAVEFIELD_STR (save string value into current field)
@@ -1301,7 +1530,8 @@ class Decoding:
 
         self.tree.append(torque.Assignment(name, value))
 
-        logging.debug("IP: {}: {}: Save string value into field".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Save string value into field".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_STR_TO_UINT (convert string to uint)
@@ -1311,7 +1541,8 @@ class Decoding:
     def opStrToUint(self):
         self.intStack.append(self.getStringValue())
 
-        logging.debug("IP: {}: {}: Add top of string into uint stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Add top of string into uint stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_STR_TO_FLT (convert string to float)
@@ -1321,7 +1552,8 @@ class Decoding:
     def opStrToFlt(self):
         self.fltStack.append(self.getStringValue())
 
-        logging.debug("IP: {}: {}: Add top of string stack into float stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Add top of string stack into float stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_STR_TO_NONE (discard string on top of stack)
@@ -1335,7 +1567,8 @@ class Decoding:
         if isinstance(popd, torque.FuncCall) and self.callStack[-1] is Decoding.opCallfunc:
             self.tree.append(popd)
 
-        logging.debug("IP: {}: {}: Pop string out".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop string out".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_FLT_TO_UINT (convert float to uint)
@@ -1345,7 +1578,8 @@ class Decoding:
     def opFltToUint(self):
         self.intStack.append(self.fltStack.pop())
 
-        logging.debug("IP: {}: {}: Pop float into uint stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop float into uint stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_FLT_TO_STR (convert float to string)
@@ -1355,7 +1589,8 @@ class Decoding:
     def opFltToStr(self):
         self.strStack.load(self.fltStack.pop())
 
-        logging.debug("IP: {}: {}: Pop float into string stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop float into string stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_FLT_TO_NONE (discard float on top of stack)
@@ -1365,7 +1600,8 @@ class Decoding:
     def opFltToNone(self):
         self.fltStack.pop()
 
-        logging.debug("IP: {}: {}: Pop float out".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop float out".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_UINT_TO_FLT (convert uint to float)
@@ -1375,7 +1611,8 @@ class Decoding:
     def opUintToFlt(self):
         self.fltStack.append(self.intStack.pop())
 
-        logging.debug("IP: {}: {}: Pop uint into float stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop uint into float stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_UINT_TO_STR (convert uint to string)
@@ -1392,7 +1629,8 @@ class Decoding:
 
         self.strStack.load(condition)
 
-        logging.debug("IP: {}: {}: Pop uint into string stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop uint into string stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_UINT_TO_NONE (discard uint on top of stack)
@@ -1406,7 +1644,8 @@ class Decoding:
         if isinstance(popd, torque.ObjCreation) and self.callStack[-1] is Decoding.opEndObject:
             self.tree.append(popd)
 
-        logging.debug("IP: {}: {}: Pop uint out".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Pop uint out".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_LOADIMMED_UINT (load uint into stack)
@@ -1416,7 +1655,8 @@ class Decoding:
     def opLoadimmedUint(self):
         self.intStack.append(self.getUint())
 
-        logging.debug("IP: {}: {}: Load uint: {}".format(self.ip, self.dumpInstruction(), self.intStack[-1]))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load uint: {}".format(self.ip, self.dumpInstruction(), self.intStack[-1]))
 
     '''
     Routine called for OP_LOADIMMED_FLT (load float into stack)
@@ -1426,7 +1666,8 @@ class Decoding:
     def opLoadimmedFlt(self):
         self.fltStack.append(self.getFloat())
 
-        logging.debug("IP: {}: {}: Load float: {}".format(self.ip, self.dumpInstruction(), self.fltStack[-1]))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load float: {}".format(self.ip, self.dumpInstruction(), self.fltStack[-1]))
 
     '''
     Routine called for OP_LOADIMMED_STR (load string into stack)
@@ -1459,12 +1700,14 @@ class Decoding:
 
         self.strStack.load(string)
 
-        logging.debug("IP: {}: {}: Load string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
 
     def opDocBlockStr(self):
         #TODO
         logging.warning('OP_DOCBLOCK_STR not implemented!')
-        logging.debug("IP: {}: {}: Load string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
 
     '''
     Routine called for OP_LOADIMMED_IDENT (load "ident" (string) into stack)
@@ -1482,7 +1725,8 @@ class Decoding:
 
         self.strStack.load(string)
 
-        logging.debug("IP: {}: {}: Load string (ident): {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load string (ident): {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
 
     '''
     Routine called for OP_TAG_TO_STR (load "tagged" string into stack)
@@ -1492,7 +1736,8 @@ class Decoding:
     def opTagToStr(self):
         self.strStack.load(self.getGlobalString())
 
-        logging.debug("IP: {}: {}: Load tagged string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Load tagged string: {}".format(self.ip, self.dumpInstruction(), self.getStringValue()))
 
     '''
     Routine called for OP_CALLFUNC and OP_CALLFUNC_RESOLVE (call function)
@@ -1520,7 +1765,8 @@ class Decoding:
 
         self.strStack.load(torque.FuncCall(funcName, namespace, callType, argv))
 
-        logging.debug("IP: {}: {}: Call function: {}, {}, {}".format(self.ip, self.dumpInstruction(), funcName, namespace, callType))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Call function: {}, {}, {}".format(self.ip, self.dumpInstruction(), funcName, namespace, callType))
 
     '''
     Routine called for OP_ADVANCE_STR (advance top pointer of stack to end of top string)
@@ -1530,7 +1776,8 @@ class Decoding:
     def opAdvanceStr(self):
         self.strStack.advance()
 
-        logging.debug("IP: {}: {}: Advance string on stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Advance string on stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_ADVANCE_STR_APPENDCHAR (advance top pointer of stack to end of top string and append character)
@@ -1540,7 +1787,8 @@ class Decoding:
     def opAdvanceStrAppendchar(self):
         self.strStack.advance(chr(self.getCode()))
 
-        logging.debug("IP: {}: {}: Advance string on stack and append char".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Advance string on stack and append char".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_ADVANCE_STR_COMMA (advance top pointer of stack to end of top string and append comma)
@@ -1550,7 +1798,8 @@ class Decoding:
     def opAdvanceStrComma(self):
         self.strStack.advance(",")
 
-        logging.debug("IP: {}: {}: Advance string on stack and append comma".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Advance string on stack and append comma".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_ADVANCE_STR_NUL (advance top pointer of stack to end of top string and append null byte)
@@ -1560,7 +1809,8 @@ class Decoding:
     def opAdvanceStrNul(self):
         self.strStack.advance("\x00")
 
-        logging.debug("IP: {}: {}: Advance string on stack (null)".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Advance string on stack (null)".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_REWIND_STR (rewind top pointer of stack to previous element)
@@ -1570,7 +1820,8 @@ class Decoding:
     def opRewindStr(self):
         self.strStack.rewind()
 
-        logging.debug("IP: {}: {}: Rewind string stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Rewind string stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_TERMINATE_REWIND_STR (discard top string then rewind top pointer of stack to previous element)
@@ -1580,7 +1831,8 @@ class Decoding:
     def opTerminateRewindStr(self):
         self.strStack.terminateRewind()
 
-        logging.debug("IP: {}: {}: Terminate and rewind string stack".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Terminate and rewind string stack".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_COMPARE_STR (compare two strings)
@@ -1595,7 +1847,8 @@ class Decoding:
 
         self.intStack.append(op)
 
-        logging.debug("IP: {}: {}: Compare strings".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Compare strings".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_PUSH (push string into argument frame)
@@ -1604,7 +1857,8 @@ class Decoding:
     '''
     def opPush(self):
         self.argFrame[-1].append(self.getStringValue())
-        logging.debug("IP: {}: {}: Push string to argument frame".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Push string to argument frame".format(self.ip, self.dumpInstruction()))
 
     '''
     Routine called for OP_PUSH_FRAME (push new argument frame)
@@ -1614,7 +1868,8 @@ class Decoding:
     def opPushFrame(self):
         self.argFrame.append([])
 
-        logging.debug("IP: {}: {}: Push empty argument frame".format(self.ip, self.dumpInstruction()))
+        if self.tracer:
+            self.tracer.emit("IP: {}: {}: Push empty argument frame".format(self.ip, self.dumpInstruction()))
 
     '''
     Dictionary of calls by opcode
@@ -1702,51 +1957,101 @@ class Decoding:
 79:opPush,
 80:opPushFrame,
     }
+
+    '''
+    List of calls by opcode (None for opcodes without routine), for dispatching with a single index (plain functions are
+    called faster than bound methods)
+    '''
+    calls = list(map(callOp.get, range(0, max(callOp) + 1)))
     
+    '''
+    Traces state of decoding before an instruction is executed
+    @param  opCode  Opcode of instruction about to be executed
+    @param  codes   List of codes of bytecode, by code index
+    '''
+    def traceInstruction(self, opCode, codes):
+        #Dump stacks from previous call
+        self.tracer.emit("\nStacks: SS {} IS {} FS {} BS {}".format(self.strStack, self.intStack, self.fltStack, self.binStack))
+        #Show some info about curent call that about to happen
+        self.tracer.emit('CS:{} IP:{} OP:{} {} af: {} cv:{} cf:{} co:{}'.format(
+            self.callStack.total, self.ip, opCode, OPCODES[opCode], self.argFrame, self.curvar, self.curfield, self.curobj))
+        # Codes whose byte index is within the next 10 bytes:
+        idxTable = self.file.byteCode.idxTable
+        self.tracer.emit("Next 10 codes: {}".format(
+            codes[bisect_left(idxTable, self.ip):bisect_left(idxTable, self.ip+10)]))
+
     '''
     Decodes parsed file
+    @param  end     Byte index to stop decoding at (default end of bytecode, for partial decompilation only)
     '''
-    def decode(self):
-        while self.ip < self.file.byteCode.binLen:
+    def decode(self, end=None):
+        tracing = bool(self.tracer)
+        if tracing:
+            # Codes listed in the same order as the index table, for windowing:
+            codes = list(self.file.byteCode.dumpTab.values())
+
+        if end is None:
+            end = self.file.byteCode.binLen
+
+        calls = self.calls
+        timedCalls = self.timedCalls
+        count = len(calls)
+        endCtrlCode = self.file.byteCode.endCtrlCode
+
+        while self.ip < end:
             try:
                 # If one or more code block have ended:
                 if self.ip in self.endBlock:
-                    for end in self.endBlock.pop(self.ip):
+                    # Top-level function that ended, if any:
+                    released = None
+
+                    for block in self.endBlock.pop(self.ip):
                         self.tree.focusParent()
-                        if isinstance(end, torque.If) and end.elseHandle is not None:
+                        if isinstance(block, torque.If) and block.elseHandle is not None:
                             # Append else to tree:
-                            self.tree.append(end.elseHandle)
+                            self.tree.append(block.elseHandle)
                             self.tree.focusChild()
-                        elif isinstance(end, torque.FuncDecl):
+                        elif isinstance(block, torque.FuncDecl):
                             # Exit function:
                             self.inFunction -= 1
+                            if block.parent is self.tree.root:
+                                released = block
+
+                    # Format function (and whatever precedes it) once all its blocks are closed:
+                    if released is not None and self.stream is not None:
+                        self.tree.flush(sink=self.stream)
 
                 
                 # Get current opcode:
-                opCode = self.getCode()
-                
-                #Dump stacks from previous call
-                logging.debug("\nStacks: SS {} IS {} FS {} BS {}".format(self.strStack, self.intStack, self.fltStack, self.binStack))
-                #Show some info about curent call that about to happen
-                logging.debug('CS:{} IP:{} OP:{} {} af: {} cv:{} cf:{} co:{}'.format(
-                    len(self.callStack), self.ip, opCode, OPCODES[opCode], self.argFrame, self.curvar, self.curfield, self.curobj))
-                logging.debug("Next 10 codes: {}".format(
-                    [ self.file.byteCode.dumpTab[k] for k in self.file.byteCode.dumpTab if self.ip+10 > k >= self.ip ]) )
+                opCode = self.getInstruction()
+
+                # Opcodes without routine end decoding:
+                call = calls[opCode] if opCode < count else None
+                if call is None:
+                    if opCode == endCtrlCode:
+                        if tracing:
+                            self.tracer.emit("IP: {}: Got (supposed) end control sequence: Terminating".format(self.ip))
+                        return
+
+                    raise ValueError("Invalid opcode: {}: {}".format(self.ip, opCode))
                 
-                if len(self.callStack) > 167:  
-                    _ = "This is for debugging breakpoint"
+                # Trace only if there is anywhere to send it to:
+                if tracing:
+                    self.traceInstruction(opCode, codes)
                 
                 # Call its respective routine:
-                self.callOp[opCode](self)
+                if timedCalls is None:
+                    call(self)
+                else:
+                    timedCalls[opCode](self)
 
                 # Record call:
-                self.callStack.append(self.callOp[opCode])
+                self.callStack.record(self.ip, call)
 
                 # Update instruction pointer and count:
                 self.ip = self.getCurByteIndex()
             except Exception as e:
-                if e.__class__ is KeyError and opCode == self.file.byteCode.endCtrlCode:
-                    logging.debug("IP: {}: Got (supposed) end control sequence: Terminating".format(self.ip))
-                    return
-                else:
-                    raise e
+                if self.callStack.maxlen > 2:
+                    logging.error("Last {} instructions before failure:\n{}".format(
+                        len(self.callStack), "\n".join(self.callStack.dump())))
+                raise e
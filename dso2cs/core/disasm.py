@@ -0,0 +1,173 @@
+from sys import stdout
+from array import array
+from bisect import bisect_left
+
+from core.opcodes import OPCODES, opOperands
+from core.binary import structs
+
+# Bytecode is always little endian:
+uint32 = structs["little"]["uint32"]
+
+'''
+Table of the instructions of a bytecode, decoded once and stored in flat arrays. Instruction i has opcode opcodes[i], starts
+at byte ips[i] and code index codes[i], and its operands are operands[firsts[i]:firsts[i+1]] (of kinds kinds[...]). The
+position arrays have one extra entry, marking where disassembly stopped
+'''
+class Instructions:
+    # Kinds of operands:
+    CODE = 0
+    STRING = 1
+    PATCHED = 2     # String offset patched in (always refers to the global string table)
+    FLOAT = 3
+    EXTENDED = 4    # String offset that follows an extension control code (4 bytes long)
+
+    '''
+    Constructs an Instructions object
+    @param  byteCode    Patched dso.ByteCode to be disassembled
+    @param  start       Byte index to start disassembling from (default 0)
+    '''
+    def __init__(self, byteCode, start=0):
+        self.opcodes = array('L')
+        self.ips = array('L')
+        self.codes = array('L')
+        self.firsts = array('L')
+        self.operands = array('L')
+        self.kinds = array('B')
+
+        # Exception that stopped disassembly before the end of the bytecode, if any:
+        self.error = None
+
+        # Operands are read inline (same encoding as dso.ByteCode methods), since this runs once per code:
+        pointer = start
+        code = bisect_left(byteCode.idxTable, start)
+        try:
+            while pointer < byteCode.binLen:
+                ip = pointer
+                opCode, pointer = self.readCode(byteCode, pointer)
+
+                # Unknown opcodes (and end control code) are recorded, but nothing past them can be decoded:
+                layout = opOperands.get(opCode)
+                if layout is None:
+                    self.record(ip, code, opCode, [], [])
+                    code += 1
+                    break
+
+                values = []
+                kinds = []
+                for kind in layout:
+                    if kind == "s":
+                        value, pointer, stringKind = self.readStringOffset(byteCode, pointer)
+                        values.append(value)
+                        kinds.append(stringKind)
+                    elif kind == "f":
+                        # Float offsets are always 1 byte long:
+                        values.append(byteCode.byteStream[pointer])
+                        kinds.append(self.FLOAT)
+                        pointer += 1
+                    elif kind == "*":
+                        for _ in range(0, values[-1]):
+                            value, pointer, stringKind = self.readStringOffset(byteCode, pointer)
+                            values.append(value)
+                            kinds.append(stringKind)
+                    else:
+                        value, pointer = self.readCode(byteCode, pointer)
+                        values.append(value)
+                        kinds.append(self.CODE)
+
+                self.record(ip, code, opCode, values, kinds)
+                code += 1 + len(values)
+        except IndexError as e:
+            # Truncated instruction, let the decoder fail when it gets there:
+            self.error = e
+            pointer = ip
+
+        # Mark the end of the last instruction:
+        self.ips.append(pointer)
+        self.codes.append(code)
+        self.firsts.append(len(self.operands))
+
+    '''
+    Reads a code (1 byte, or 4 bytes after extension control code)
+    @param  byteCode    dso.ByteCode to read from
+    @param  pointer     Byte index of the code
+    @return tuple       Code and byte index after it
+    '''
+    def readCode(self, byteCode, pointer):
+        code = byteCode.byteStream[pointer]
+        if code == byteCode.extCtrlCode:
+            return self.readUint32(byteCode, pointer + 1), pointer + 5
+
+        return code, pointer + 1
+
+    '''
+    Reads a string offset (4 bytes if patched in, encoded as a code otherwise)
+    @param  byteCode    dso.ByteCode to read from
+    @param  pointer     Byte index of the string offset
+    @return tuple       Offset, byte index after it and its kind (PATCHED, EXTENDED or STRING)
+    '''
+    def readStringOffset(self, byteCode, pointer):
+        if byteCode.isPatched(pointer):
+            return self.readUint32(byteCode, pointer), pointer + 4, self.PATCHED
+
+        code, after = self.readCode(byteCode, pointer)
+        return code, after, self.EXTENDED if after - pointer > 1 else self.STRING
+
+    '''
+    Reads a 4-bytes long unsigned integer
+    @param  byteCode    dso.ByteCode to read from
+    @param  pointer     Byte index of the integer
+    '''
+    def readUint32(self, byteCode, pointer):
+        if pointer + 4 > byteCode.binLen:
+            raise IndexError("Index out of range")
+
+        return uint32.unpack_from(byteCode.byteStream, pointer)[0]
+
+    '''
+    Appends an instruction to the table
+    @param  ip      Byte index of the instruction
+    @param  code    Code index of the instruction
+    @param  opCode  Opcode of the instruction
+    @param  values  List of operand values
+    @param  kinds   List of operand kinds
+    '''
+    def record(self, ip, code, opCode, values, kinds):
+        self.opcodes.append(opCode)
+        self.ips.append(ip)
+        self.codes.append(code)
+        self.firsts.append(len(self.operands))
+        self.operands.extend(values)
+        self.kinds.extend(kinds)
+
+    '''
+    Number of instructions
+    '''
+    def __len__(self):
+        return len(self.opcodes)
+
+    '''
+    Retrieves the operands of an instruction
+    @param  idx     Index of the instruction
+    '''
+    def getOperands(self, idx):
+        return self.operands[self.firsts[idx]:self.firsts[idx+1]].tolist()
+
+    '''
+    Finds the instruction at given byte index
+    @param  ip      Byte index of the instruction
+    '''
+    def find(self, ip):
+        idx = bisect_left(self.ips, ip, 0, len(self))
+        if idx == len(self) or self.ips[idx] != ip:
+            raise KeyError(ip)
+
+        return idx
+
+    '''
+    Dumps a listing of the instructions
+    @param  sink    Output to dump listing to (default stdout)
+    '''
+    def dump(self, sink=stdout):
+        for idx in range(0, len(self)):
+            print("{:>8} {:>8}  {:<28} {}".format(self.ips[idx], self.codes[idx],
+                OPCODES.get(self.opcodes[idx], hex(self.opcodes[idx])), self.getOperands(idx)), file=sink)
@@ -1,7 +1,8 @@
 from sys import stdout
 from os.path import getsize
+from mmap import mmap as MemoryMap, ACCESS_READ
 from collections import OrderedDict
-from core import binary
+from core import binary, disasm
 import logging
 
 '''
@@ -19,12 +20,24 @@ class StringTable(dict):
 
         # Get length, in bytes, of this field:
         self.binLen = binReader.unpackUint32()
+        # Read the whole field at once:
+        data = binReader.read(self.binLen)
         # Store every string and their respective offsets:
         offset = 0
-        while offset < self.binLen:
-            self[offset] = binReader.readString(self.binLen - offset -1)
-            #print(self.binLen-offset-1, offset, self[offset])
-            offset += len(self[offset]) + 1
+        if self.binLen:
+            # Last byte is always taken as terminator, even if it is not a null byte (last string gets truncated):
+            for string in data[:-1].split(b'\x00'):
+                self[offset] = string
+                offset += len(string) + 1
+
+    '''
+    Moves a binary reader past a table, without parsing it
+    @param  binReader    Binary reader positioned at the table
+    '''
+    @staticmethod
+    def skip(binReader):
+        length = binReader.unpackUint32()
+        binReader.pointer += length
         
     '''
     Gets a string or substring of the table
@@ -65,6 +78,15 @@ class FloatTable(list):
             if val == round(val): val = round(val)
             self.append(val)
 
+    '''
+    Moves a binary reader past a table, without parsing it
+    @param  binReader    Binary reader positioned at the table
+    '''
+    @staticmethod
+    def skip(binReader):
+        length = binReader.unpackUint32()
+        binReader.pointer += 8 * length
+
     def compare(self, other):
         return [ [i,[v1,v2]] for i, (v1,v2) in enumerate(zip(self,other)) if v1 != v2 ]
 
@@ -99,20 +121,21 @@ class ByteCode(binary.Reading):
         # Get start offset of bytecode:
         offset = binReader.pointer
         for _ in range(0, self.codLen):
-            # Read byte:
-            bt = binReader.read8()
+            # Read code:
+            code = binReader.unpackUint8()
             # If extension control code:
-            if bt == self.extCtrlByte:
+            if code == self.extCtrlCode:
                 # Get next 4 bytes as part of same code:
-                bt += binReader.read32()
-                # Add address for debugging
-                self.dumpTab[binReader.pointer - offset - 1] = int.from_bytes(bt[1:], byteorder='little', signed=False)
-            else:
-                self.dumpTab[binReader.pointer - offset - 1] = int.from_bytes(bt, byteorder='little', signed=False)
-            # Append packed code to stream:
-            self.append(bt)
+                code = binReader.unpackUint32()
+            # Add address for debugging
+            self.dumpTab[binReader.pointer - offset - 1] = code
             # Store the index of the code in the stream:
             self.idxTable.append(binReader.pointer - offset - 1)
+
+        # Copy the whole code stream at once, now that its end is known:
+        end = binReader.pointer
+        binReader.pointer = offset
+        self.byteStream = binReader.read(end - offset)
         
         #Make sure idxTable and dumpTab are synchronized
         assert [ i for i,d in zip(self.idxTable, self.dumpTab.keys()) if i != d ] == [], f"idxTable and dumpTable differ!"
@@ -124,6 +147,36 @@ class ByteCode(binary.Reading):
         for _ in range(0, self.lb_pair_count*2):
             self.lb_pairs.append((binReader.unpackUint32()))
 
+    '''
+    Moves a binary reader past a bytecode, without parsing it. Codes are one byte long except for extended ones, so only
+    the extension control codes have to be looked for
+    @param  binReader   Binary reader positioned at the bytecode
+    @param  data        Bytes (or memory map) being read, for searching
+    @param  extCtrlCode Control code to indicate 2-bytes long code value
+    '''
+    @staticmethod
+    def skip(binReader, data, extCtrlCode=0xff):
+        codLen = binReader.unpackUint32()
+        lbPairCount = binReader.unpackUint32()
+
+        extCtrlByte = bytes([extCtrlCode])
+        pointer = binReader.pointer
+        while codLen:
+            found = data.find(extCtrlByte, pointer, pointer + codLen)
+            if found < 0:
+                # Only one byte long codes left:
+                pointer += codLen
+                break
+
+            # Codes before the extended one, and the extended one with its 4 bytes:
+            codLen -= found - pointer + 1
+            pointer = found + 5
+
+        if pointer > len(data):
+            raise IndexError("Index out of range")
+
+        binReader.pointer = pointer + 8 * lbPairCount
+
     '''
     Retrieves the code currently pointed at
     '''
@@ -158,7 +211,7 @@ class ByteCode(binary.Reading):
     '''
     def getStringOffset(self):
         # First look if string was patched in, because it can have 0xff as lowest byte
-        self.in_patchlocks = self.pointer in self.patchlocs #Helper flag to resolve table access in getStringByOffset
+        self.in_patchlocks = self.isPatched(self.pointer) #Helper flag to resolve table access in getStringByOffset
         if self.in_patchlocks:
             #Return patched in string offset
             return self.unpackUint32()
@@ -173,6 +226,13 @@ class ByteCode(binary.Reading):
             #Just next byte
             return self.unpackUint8()
 
+    '''
+    Checks if a string offset was patched in at given location
+    @param  loc     Byte index of the location
+    '''
+    def isPatched(self, loc):
+        return loc < self.binLen and self.patchmap[loc] == 1
+
     '''
     Retrieves next two bytes as float offset
     '''
@@ -199,7 +259,9 @@ class ByteCode(binary.Reading):
     @param  stringTable globalStringTable described in the file
     '''
     def patchStrings(self, identTable, stringTable):
-        self.patchlocs = [] # torque convoluted magic will go here
+        # Patches by code index (patch and its offset value), and the order in which they are listed:
+        patches = {}
+        order = []
         for patch, indexes in identTable.items():
             # Check if offset patch is in StringTable and add it if it's not.
             # Unused function variables are patched in anyway, 
@@ -211,25 +273,49 @@ class ByteCode(binary.Reading):
                 var = f'%unused_var{pval}'.encode()
                 stringTable[pval] = var
                 stringTable.binLen = stringTable.binLen + len(var)
-                
-            #Patch locations in code stream. 
+
             for idx in indexes:
-                loc  = self.idxTable[idx]
-                assert self.byteStream[loc] == 0, "Patching should replace zero!!!"
-
-                self.insert(loc, patch, discard=1)      # Patch location (code index)
-                self.binLen = self.binLen +3             #Increase code length
-
-                self.dumpTab[loc] = stringTable[pval]  #put string in dumpTab instead offset 
-                
-                #We replaced 1 byte with 4, so idxTable and patch locations need to increase as well.
-                self.idxTable[idx+1:] = [ v+3 for v in self.idxTable[idx+1:]] #Upadate index table
-                for i, pl in enumerate(self.patchlocs): 
-                        if pl > loc: self.patchlocs[i]=pl+3
-                self.patchlocs.append(loc) # List patched location (byte index)
-                #Also shift dumpTab keys to match IPs if key value bigger than current location
-                offset_keys = { k+3:self.dumpTab.pop(k) for k in self.dumpTab.copy() if k>loc }
-                self.dumpTab.update(offset_keys)
+                assert idx not in patches, "Location patched twice!"
+                patches[idx] = (patch, pval)
+                order.append(idx)
+
+        # Build patched stream and index table in a single pass over the sorted locations.
+        # We replace 1 byte with 4 at every location, so every code after it moves 3 bytes further:
+        chunks = []
+        idxTable = []
+        prev = 0 # Byte index of the unpatched stream copied so far
+        start = 0 # Code index of the index table shifted so far
+        for shift, idx in enumerate(sorted(patches)):
+            loc = self.idxTable[idx]
+            assert self.byteStream[loc] == 0, "Patching should replace zero!!!"
+
+            chunks.append(self.byteStream[prev:loc])
+            chunks.append(patches[idx][0])      # Patch location (code index)
+            prev = loc + 1
+
+            idxTable.extend([ v + 3*shift for v in self.idxTable[start:idx+1] ])
+            start = idx + 1
+
+        chunks.append(self.byteStream[prev:])
+        idxTable.extend([ v + 3*len(patches) for v in self.idxTable[start:] ])
+
+        self.byteStream = b''.join(chunks)
+        self.binLen = self.binLen + 3*len(patches)     #Increase code length
+        self.idxTable = idxTable
+
+        # List patched locations (byte index):
+        self.patchlocs = [ idxTable[idx] for idx in order ]
+        # Also mark them in a map indexed by byte, for constant time lookups:
+        self.patchmap = bytearray(self.binLen)
+        for loc in self.patchlocs:
+            self.patchmap[loc] = 1
+
+        #Also rekey dumpTab to match IPs, putting strings in dumpTab instead of offsets
+        values = list(self.dumpTab.values())
+        for idx, (patch, pval) in patches.items():
+            values[idx] = stringTable[pval]
+        self.dumpTab.clear()
+        self.dumpTab.update(zip(idxTable, values))
 
         #Sanity checks
         assert self.binLen == len(self.byteStream), "Bytestream length diffre after patching!"
@@ -310,25 +396,110 @@ class File():
     '''
     Constructs a File object
     @param  path    Path of file to be parsed
+    @param  mmap    Map the file into memory instead of reading it (default False)
+    @param  lazy    Only index the sections of the file (see index), parsing each of them on first access (default False)
     '''
-    def __init__(self, path):
+    def __init__(self, path, mmap=False, lazy=False):
         # Save file path:
         self.path = path
 
         # Save file name:
         self.name = path.name
 
-        # Dump contents to a binary reader:
+        # Memory map of the file, if any:
+        self.map = None
+
         with open(path, "rb") as fd:
-            self.binReader = binary.Reading(fd.read(), "little")
+            if mmap:
+                # Parse straight from the mapping (it stays valid after the descriptor is closed):
+                self.map = MemoryMap(fd.fileno(), 0, access=ACCESS_READ)
+                self.binReader = binary.MemoryReading(self.map, "little")
+            else:
+                # Dump contents to a binary reader:
+                self.binReader = binary.MemoryReading(fd.read(), "little")
 
         # Not parsed yet:
         self.parsed = False
 
+        # Byte indexes of sections not parsed yet, by attribute (None if not indexed):
+        self.offsets = None
+
+        if lazy:
+            self.index()
+
+    '''
+    Parsers of sections by attribute, in order of the file (the ident table is last, so it checks for EOF)
+    '''
+    sections = OrderedDict([
+        ("globalStringTable",   StringTable),
+        ("functionStringTable", StringTable),
+        ("globalFloatTable",    FloatTable),
+        ("functionFloatTable",  FloatTable),
+        ("byteCode",            ByteCode),
+        ("identTable",          IdentTable)
+    ])
+
+    '''
+    Records the byte index of every section in one scan, skipping their contents, so that each of them is only parsed when
+    its attribute is first accessed (e.g. only the string tables, when searching them). Much faster than parseSections,
+    since the bytecode is not decoded code by code
+    '''
+    def index(self):
+        binReader = self.binReader
+        binReader.pointer = 0
+
+        self.version = binReader.unpackUint32()
+
+        offsets = {}
+        for name, section in self.sections.items():
+            offsets[name] = binReader.pointer
+            if section is ByteCode:
+                ByteCode.skip(binReader, self.map if self.map is not None else binReader.byteStream.obj)
+            elif section is not IdentTable:
+                section.skip(binReader)
+
+        self.offsets = offsets
+
+    '''
+    Parses a section that was indexed but not parsed yet, on first access of its attribute
+    @param  name    Name of attribute
+    '''
+    def __getattr__(self, name):
+        # Looked up in the instance dictionary, as this is called for missing attributes (even while unpickling):
+        offsets = self.__dict__.get("offsets")
+        if not offsets or name not in offsets:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+        self.binReader.pointer = offsets[name]
+        section = self.sections[name](self.binReader)
+        logging.debug('Parsed section on access: {}'.format(name))
+
+        if name == "identTable" and getsize(self.path) != self.binReader.pointer:
+            raise ParsingError("Parsing did not reach EOF", self.name)
+
+        # Only sections parsed successfully are kept:
+        del offsets[name]
+        setattr(self, name, section)
+
+        return section
+
     '''
     Parses the file into tables and bytecode
     '''
     def parse(self):
+        self.parseSections()
+        self.patchStrings()
+
+    '''
+    Parses sections of the file into tables and bytecode, leaving bytecode unpatched (first step of parse)
+    '''
+    def parseSections(self):
+        # Parse whatever sections were indexed but not parsed yet:
+        if self.offsets is not None:
+            for name in list(self.offsets):
+                getattr(self, name)
+            return
+
         # Parse the version of script:
         self.version = self.binReader.unpackUint32()
         logging.info('DSO file version: {}'.format(self.version))
@@ -355,11 +526,52 @@ class File():
         if getsize(self.path) != self.binReader.pointer:
             raise ParsingError("Parsing did not reach EOF", self.name)
 
-        # Patch bytecode, resolving all references to strings:
+    '''
+    Patches bytecode, resolving all references to strings (second step of parse)
+    '''
+    def patchStrings(self):
         self.byteCode.patchStrings(self.identTable, self.globalStringTable)
         logging.debug('Bytecode size after patching: {}'.format(self.byteCode.binLen))
         self.parsed = True
 
+        # Parsed structures hold their own copies, the mapping is not needed anymore:
+        if self.map is not None:
+            self.close()
+
+    '''
+    State for pickling (e.g. for sending a parsed file to another process). The reader and the mapping cannot be pickled,
+    and are only needed for parsing
+    '''
+    def __getstate__(self):
+        if not self.parsed:
+            raise NotParsedError("__getstate__")
+
+        state = self.__dict__.copy()
+        state["binReader"] = None
+        state["map"] = None
+        return state
+
+    '''
+    Releases the memory map of the file, if any
+    '''
+    def close(self):
+        if self.map is not None:
+            self.binReader.release()
+            self.map.close()
+            self.map = None
+
+    '''
+    Disassembles the bytecode into a table of instructions (done only once per file)
+    '''
+    def disassemble(self):
+        if not self.parsed:
+            raise NotParsedError("disassemble")
+
+        if getattr(self, "instructions", None) is None:
+            self.instructions = disasm.Instructions(self.byteCode)
+
+        return self.instructions
+
     '''
     Dumps the structures of the parsed file
     @param  sink    Output to dump contents to
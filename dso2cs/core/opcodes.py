@@ -85,3 +85,98 @@ OPCODES = {
 }
 
 opByName = { o:i for i, o in OPCODES.items() }
+
+'''
+Operands that follow each opcode, by kind:
+    c   code (1 byte, or 4 bytes after the extension control code)
+    u   uint (encoded as a code)
+    s   string offset (4 bytes if patched in, encoded as a code otherwise)
+    f   float offset (1 byte)
+    *   as many string offsets as the value of the previous operand
+Opcodes not listed here are not handled by the decoder
+'''
+OPERANDS = {
+    'OP_FUNC_DECL':                 'sssccc*',
+    'OP_CREATE_OBJECT':             'succc',
+    'OP_ADD_OBJECT':                'c',
+    'OP_END_OBJECT':                'c',
+    'OP_JMPIFFNOT':                 'c',
+    'OP_JMPIFNOT':                  'c',
+    'OP_JMPIFF':                    'c',
+    'OP_JMPIF':                     'c',
+    'OP_JMPIFNOT_NP':               'c',
+    'OP_JMPIF_NP':                  'c',
+    'OP_JMP':                       'c',
+    'OP_RETURN':                    '',
+    'OP_CMPEQ':                     '',
+    'OP_CMPGR':                     '',
+    'OP_CMPGE':                     '',
+    'OP_CMPLT':                     '',
+    'OP_CMPLE':                     '',
+    'OP_CMPNE':                     '',
+    'OP_XOR':                       '',
+    'OP_MOD':                       '',
+    'OP_BITAND':                    '',
+    'OP_BITOR':                     '',
+    'OP_NOT':                       '',
+    'OP_NOTF':                      '',
+    'OP_ONESCOMPLEMENT':            '',
+    'OP_SHR':                       '',
+    'OP_SHL':                       '',
+    'OP_AND':                       '',
+    'OP_OR':                        '',
+    'OP_ADD':                       '',
+    'OP_SUB':                       '',
+    'OP_MUL':                       '',
+    'OP_DIV':                       '',
+    'OP_NEG':                       '',
+    'OP_SETCURVAR':                 's',
+    'OP_SETCURVAR_CREATE':          's',
+    'OP_SETCURVAR_ARRAY':           '',
+    'OP_SETCURVAR_ARRAY_CREATE':    '',
+    'OP_LOADVAR_UINT':              '',
+    'OP_LOADVAR_FLT':               '',
+    'OP_LOADVAR_STR':               '',
+    'OP_SAVEVAR_UINT':              '',
+    'OP_SAVEVAR_FLT':               '',
+    'OP_SAVEVAR_STR':               '',
+    'OP_SETCUROBJECT':              '',
+    'OP_SETCUROBJECT_NEW':          '',
+    'OP_SETCUROBJECT_INTERNAL':     '',
+    'OP_SETCURFIELD':               's',
+    'OP_SETCURFIELD_ARRAY':         '',
+    'OP_LOADFIELD_UINT':            '',
+    'OP_LOADFIELD_FLT':             '',
+    'OP_LOADFIELD_STR':             '',
+    'OP_SAVEFIELD_UINT':            '',
+    'OP_SAVEFIELD_FLT':             '',
+    'OP_SAVEFIELD_STR':             '',
+    'OP_STR_TO_UINT':               '',
+    'OP_STR_TO_FLT':                '',
+    'OP_STR_TO_NONE':               '',
+    'OP_FLT_TO_UINT':               '',
+    'OP_FLT_TO_STR':                '',
+    'OP_FLT_TO_NONE':               '',
+    'OP_UINT_TO_FLT':               '',
+    'OP_UINT_TO_STR':               '',
+    'OP_UINT_TO_NONE':              '',
+    'OP_LOADIMMED_UINT':            'u',
+    'OP_LOADIMMED_FLT':             'f',
+    'OP_TAG_TO_STR':                's',
+    'OP_LOADIMMED_STR':             's',
+    'OP_DOCBLOCK_STR':              '',
+    'OP_LOADIMMED_IDENT':           's',
+    'OP_CALLFUNC_RESOLVE':          'ssc',
+    'OP_CALLFUNC':                  'ssc',
+    'OP_ADVANCE_STR':               '',
+    'OP_ADVANCE_STR_APPENDCHAR':    'c',
+    'OP_ADVANCE_STR_COMMA':         '',
+    'OP_ADVANCE_STR_NUL':           '',
+    'OP_REWIND_STR':                '',
+    'OP_TERMINATE_REWIND_STR':      '',
+    'OP_COMPARE_STR':               '',
+    'OP_PUSH':                      '',
+    'OP_PUSH_FRAME':                '',
+}
+
+opOperands = { opByName[o]:k for o, k in OPERANDS.items() }
@@ -0,0 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from os import cpu_count
+
+from core import codec, torque, profiler
+from core.opcodes import opByName
+
+'''
+Parsed dso.File being decoded by a worker process
+'''
+workerFile = None
+
+'''
+Stores the file to be decoded in a worker process
+@param  dsoFile     Parsed dso.File object
+'''
+def initWorker(dsoFile):
+    global workerFile
+    workerFile = dsoFile
+
+'''
+Decodes a segment of the bytecode of the worker's file
+@param  start       Byte index of first instruction of segment
+@param  end         Byte index of end of segment
+@param  strings     Global strings, by offset, as they were rewritten by the time the segment is reached
+@param  profiling   Count and time opcode routines
+@return tuple       List of decoded statements, string cache counters, number of instructions decoded and
+                    profiler.Profile (None if not profiling)
+'''
+def decodeSegment(start, end, strings, profiling=False):
+    # Restore global strings as a sequential decoding would have left them:
+    for offset, string in strings.items():
+        workerFile.globalStringTable[offset] = string
+
+    profile = profiler.Profile() if profiling else None
+
+    decoder = codec.Decoding(workerFile, offset=start, profile=profile)
+    decoder.decode(end)
+
+    return decoder.tree.root.children, decoder.getStringCacheStats(), decoder.getInstructionCount(), profile
+
+'''
+Splits the bytecode of a file at its top-level function declarations. Decoding rewrites some global strings in place (see
+Decoding.opFuncDecl and Decoding.opSetcurvar), so the same rewrites are replayed here to know how every segment would find
+the string table
+@param  dsoFile     Parsed dso.File object
+@return list        List of segments (start, end, strings) in bytecode order
+'''
+def split(dsoFile):
+    instructions = dsoFile.disassemble()
+    table = dsoFile.globalStringTable
+    idxTable = dsoFile.byteCode.idxTable
+
+    # Rewritten strings so far and snapshot of them at start of each segment:
+    strings = {}
+    starts = []
+    snapshots = []
+
+    # End of function being scanned, if any:
+    funcEnd = None
+
+    for idx in range(0, len(instructions)):
+        ip = instructions.ips[idx]
+        opCode = instructions.opcodes[idx]
+
+        # Code after the end of a function starts a new segment:
+        if funcEnd is not None and ip >= funcEnd:
+            funcEnd = None
+            starts.append(ip)
+            snapshots.append(dict(strings))
+
+        if opCode == opByName['OP_FUNC_DECL'] and funcEnd is None:
+            # Top-level function declaration starts a new segment:
+            if not starts or starts[-1] != ip:
+                starts.append(ip)
+                snapshots.append(dict(strings))
+
+            operands = instructions.getOperands(idx)
+            funcEnd = idxTable[operands[4]]
+
+            # Arguments are marked as local variables:
+            for offset in operands[6:6+operands[5]]:
+                string = getRewritable(table, strings, offset)
+                if string and string[0] != "%":
+                    strings[offset] = ("%" + string).encode()
+        elif opCode == opByName['OP_SETCURVAR']:
+            offset = instructions.getOperands(idx)[0]
+            string = getRewritable(table, strings, offset)
+            # Variables get local or global prefix:
+            if string and string[0] != "$" and string[0] != "%":
+                strings[offset] = (("%" if funcEnd is not None else "$") + string).encode()
+
+        if not starts:
+            starts.append(ip)
+            snapshots.append({})
+
+    # Every segment gets every rewritten offset, restored to how it was at its start:
+    segments = []
+    ends = starts[1:] + [dsoFile.byteCode.binLen]
+    for start, end, snapshot in zip(starts, ends, snapshots):
+        segments.append((start, end, { offset: snapshot.get(offset, table[offset]) for offset in strings }))
+
+    return segments
+
+'''
+Retrieves a global string to be checked for rewriting
+@param  table       Global dso.StringTable
+@param  strings     Strings rewritten so far, by offset
+@param  offset      Offset of string
+@return string      Decoded string (None if it can not be retrieved)
+'''
+def getRewritable(table, strings, offset):
+    try:
+        return strings.get(offset, table[offset]).decode()
+    except (KeyError, UnicodeDecodeError):
+        return None
+
+
+'''
+Decodes a DSO file's bytecode function by function in a pool of processes, with the same interface as codec.Decoding
+'''
+class ParallelDecoding:
+    '''
+    Constructs a ParallelDecoding object
+    @param  dsoFile     Parsed dso.File object to be decoded
+    @param  jobs        Number of worker processes (default number of CPUs, 1 decodes in this process)
+    @param  stream      Stream to format segments to as soon as they are stitched, releasing them from the tree (default
+                        None, keeps the whole tree)
+    @param  profile     profiler.Profile to add counts and times of opcode routines of all segments to (default None, does
+                        not profile)
+    '''
+    def __init__(self, dsoFile, jobs=None, stream=None, profile=None):
+        self.file = dsoFile
+        self.jobs = jobs or cpu_count() or 1
+        self.stream = stream
+        self.profile = profile
+
+        # Main tree of file:
+        self.tree = torque.Tree(torque.File(self.file.name))
+
+        # Counters of the decoded string caches of all segments:
+        self.stringCacheStats = {
+            "global":   {"hits": 0, "misses": 0},
+            "function": {"hits": 0, "misses": 0}
+        }
+
+        # Number of instructions decoded in all segments:
+        self.instructionCount = 0
+
+    '''
+    Retrieves hit/miss counters of the decoded string caches
+    '''
+    def getStringCacheStats(self):
+        return self.stringCacheStats
+
+    '''
+    Retrieves number of instructions decoded so far
+    '''
+    def getInstructionCount(self):
+        return self.instructionCount
+
+    '''
+    Decodes parsed file, stitching segments back in bytecode order
+    '''
+    def decode(self):
+        segments = split(self.file)
+        profiling = self.profile is not None
+
+        if self.jobs == 1 or len(segments) == 1:
+            initWorker(self.file)
+            try:
+                self.stitch(decodeSegment(*segment, profiling) for segment in segments)
+            finally:
+                initWorker(None)
+        else:
+            with ProcessPoolExecutor(self.jobs, initializer=initWorker, initargs=(self.file,)) as executor:
+                self.stitch(executor.map(decodeSegment, *zip(*segments), repeat(profiling)))
+
+    '''
+    Appends decoded segments to the tree as they come
+    @param  results     Iterable of results of decodeSegment, in bytecode order
+    '''
+    def stitch(self, results):
+        for children, stats, count, profile in results:
+            for child in children:
+                self.tree.root.append(child)
+
+            if self.stream is not None:
+                self.tree.flush(sink=self.stream)
+
+            for table, counters in stats.items():
+                for name, value in counters.items():
+                    self.stringCacheStats[table][name] += value
+
+            self.instructionCount += count
+
+            if profile is not None:
+                self.profile.merge(profile)
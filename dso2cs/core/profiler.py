@@ -0,0 +1,110 @@
+import csv
+import json
+
+from functools import wraps
+from time import perf_counter
+
+from core.opcodes import OPCODES
+
+'''
+Columns of exported profiles, in order
+'''
+columns = ["opcode", "name", "count", "time", "meanTime", "share"]
+
+'''
+Execution profile of opcode routines, represented as a dictionary of entries (dictionaries with number of calls and time
+spent, in seconds) by opcode. Profiles of several decodings (or files, or processes) can be merged into one
+'''
+class Profile(dict):
+    '''
+    Wraps opcode routines so every call is counted and timed. Time of a routine includes whatever it calls, but not the
+    dispatching itself
+    @param  calls   List of routines by opcode (None for opcodes without routine), as codec.Decoding.calls
+    @return list    List of wrapped routines, in the same order
+    '''
+    def wrap(self, calls):
+        return [ self.wrapCall(opCode, call) if call is not None else None for opCode, call in enumerate(calls) ]
+
+    '''
+    Wraps an opcode routine (keeping its name)
+    @param  opCode  Opcode of routine
+    @param  call    Routine
+    @return func    Wrapped routine
+    '''
+    def wrapCall(self, opCode, call):
+        entry = self.getEntry(opCode)
+
+        @wraps(call)
+        def timed(decoding):
+            start = perf_counter()
+            try:
+                call(decoding)
+            finally:
+                # Failed calls are counted too:
+                entry["count"] += 1
+                entry["time"] += perf_counter() - start
+
+        return timed
+
+    '''
+    Retrieves entry of an opcode, creating it if needed
+    @param  opCode  Opcode
+    @return dict    Entry of opcode
+    '''
+    def getEntry(self, opCode):
+        entry = self.get(opCode)
+        if entry is None:
+            entry = self[opCode] = {"count": 0, "time": 0.0}
+
+        return entry
+
+    '''
+    Adds counts and times of another profile to this one
+    @param  other   Profile to be merged
+    '''
+    def merge(self, other):
+        for opCode, counters in other.items():
+            entry = self.getEntry(opCode)
+            entry["count"] += counters["count"]
+            entry["time"] += counters["time"]
+
+    '''
+    Lists rows of opcodes that were called, the most time consuming first
+    @return list    List of dictionaries with the fields of columns
+    '''
+    def rows(self):
+        total = sum(entry["time"] for entry in self.values())
+
+        rows = []
+        for opCode, entry in self.items():
+            if not entry["count"]:
+                continue
+
+            rows.append({
+                "opcode": opCode,
+                "name": OPCODES.get(opCode, hex(opCode)),
+                "count": entry["count"],
+                "time": entry["time"],
+                "meanTime": entry["time"] / entry["count"],
+                "share": entry["time"] / total if total else 0.0
+            })
+
+        rows.sort(key=lambda row: row["time"], reverse=True)
+
+        return rows
+
+    '''
+    Exports the profile as CSV
+    @param  sink    Stream to write to
+    '''
+    def toCsv(self, sink):
+        writer = csv.DictWriter(sink, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(self.rows())
+
+    '''
+    Exports the profile as JSON
+    @param  sink    Stream to write to
+    '''
+    def toJson(self, sink):
+        json.dump(self.rows(), sink, indent=4)
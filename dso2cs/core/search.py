@@ -0,0 +1,73 @@
+import re
+
+from os import scandir
+
+from core import dso
+
+'''
+String tables that can be searched, by name
+'''
+tables = {
+    "global":   "globalStringTable",
+    "function": "functionStringTable"
+}
+
+'''
+Compiles a pattern to be matched against (raw) strings of string tables
+@param  pattern     Pattern, as given
+@param  regex       Pattern is a regular expression, instead of a literal string
+@param  ignoreCase  Match regardless of case
+@return Pattern     Compiled bytes pattern
+'''
+def compilePattern(pattern, regex=False, ignoreCase=False):
+    raw = pattern.encode()
+    return re.compile(raw if regex else re.escape(raw), re.IGNORECASE if ignoreCase else 0)
+
+'''
+Escapes of control characters, so that every hit fits in a line
+'''
+escapes = str.maketrans({"\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+'''
+Walks paths for DSO files, yielding them as they are found (directories are walked recursively, in sorted order, and
+files are yielded whatever their name)
+@param  paths   List of paths of files and directories
+'''
+def walk(paths):
+    for path in paths:
+        if path.is_dir():
+            yield from walkDir(path)
+        else:
+            yield path
+
+'''
+Walks a directory recursively for DSO files
+@param  path    Path of directory
+'''
+def walkDir(path):
+    with scandir(path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    for entry in entries:
+        if entry.is_dir():
+            yield from walkDir(path / entry.name)
+        elif entry.name.endswith(".dso"):
+            yield path / entry.name
+
+'''
+Searches string tables of a DSO file, parsing nothing but them
+@param  path        Path of file
+@param  pattern     Compiled bytes pattern
+@param  names       Names of tables to be searched (see tables)
+@return list        List of hits (table, offset, string), in order of table and offset
+'''
+def searchFile(path, pattern, names):
+    myFile = dso.File(path, lazy=True)
+
+    hits = []
+    for name in names:
+        for offset, string in getattr(myFile, tables[name]).items():
+            if pattern.search(string):
+                hits.append((name, offset, string.decode(errors="replace")))
+
+    return hits
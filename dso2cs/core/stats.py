@@ -0,0 +1,123 @@
+from sys import platform
+from time import perf_counter, process_time
+
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    # Not available on Windows, peak memory is not reported then:
+    getrusage = None
+
+'''
+Retrieves peak resident memory of this process so far
+@return int     Peak resident memory, in kilobytes (None if unknown)
+'''
+def getPeakMemory():
+    if getrusage is None:
+        return None
+
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes elsewhere:
+    return peak // 1024 if platform == "darwin" else peak
+
+
+'''
+Statistics of decompilation of a file, represented as a dictionary (ready to be dumped as JSON) with size of file, number
+of instructions decoded and statistics of each stage by name
+'''
+class Stats(dict):
+    '''
+    Constructs a Stats object
+    @param  name    Name of file
+    @param  size    Size of file, in bytes
+    '''
+    def __init__(self, name, size):
+        # Inherit all characteristics of a dictionary:
+        super().__init__()
+
+        self["file"] = name
+        self["bytes"] = size
+        self["instructions"] = None
+        self["stages"] = {}
+
+    '''
+    Measures a stage, to be used as a context manager (stages that fail are measured too)
+    @param  name    Name of stage
+    '''
+    def stage(self, name):
+        return Stage(self["stages"], name)
+
+    '''
+    Sets the number of instructions decoded, computing decoding throughput
+    @param  count   Number of instructions
+    '''
+    def setInstructions(self, count):
+        self["instructions"] = count
+
+        decode = self["stages"].get("decode")
+        if decode is not None and decode["wall"] > 0:
+            decode["instructionsPerSecond"] = count / decode["wall"]
+
+
+'''
+Measurement of a stage: wall time, CPU time (of this process) and peak memory, in kilobytes, as the growth of the peak
+resident memory of this process during the stage (0 if the stage stayed below an earlier peak; memory of other processes,
+e.g. of ParallelDecoding, is not counted). Nothing is traced, so measuring does not slow stages down
+'''
+class Stage:
+    '''
+    Constructs a Stage object
+    @param  stages  Dictionary to store measurement in
+    @param  name    Name of stage
+    '''
+    def __init__(self, stages, name):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.peakMemory = getPeakMemory()
+        self.wall = perf_counter()
+        self.cpu = process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = perf_counter() - self.wall
+        cpu = process_time() - self.cpu
+
+        peakMemory = getPeakMemory()
+        if peakMemory is not None:
+            peakMemory -= self.peakMemory
+
+        self.stages[self.name] = {
+            "wall": wall,
+            "cpu": cpu,
+            "peakMemory": peakMemory
+        }
+
+
+'''
+Aggregates statistics of several files: totals of each stage, overall decoding throughput and highest peak memory
+@param  files   List of Stats
+@return dict    Aggregated statistics
+'''
+def aggregate(files):
+    stages = {}
+    for stats in files:
+        for name, stage in stats["stages"].items():
+            total = stages.setdefault(name, {"files": 0, "wall": 0.0, "cpu": 0.0, "peakMemory": None})
+            total["files"] += 1
+            total["wall"] += stage["wall"]
+            total["cpu"] += stage["cpu"]
+            if stage["peakMemory"] is not None:
+                total["peakMemory"] = max(total["peakMemory"] or 0, stage["peakMemory"])
+
+    instructions = sum(stats["instructions"] or 0 for stats in files)
+    decode = stages.get("decode")
+    if decode is not None and decode["wall"] > 0:
+        decode["instructionsPerSecond"] = instructions / decode["wall"]
+
+    return {
+        "files": len(files),
+        "bytes": sum(stats["bytes"] or 0 for stats in files),
+        "instructions": instructions,
+        "stages": stages
+    }
@@ -0,0 +1,257 @@
+import sqlite3
+
+from hashlib import sha256
+from pathlib import Path
+
+from core import __version__, dso, torque, cache
+from core.opcodes import opByName
+
+'''
+Default path of the symbol index
+'''
+defaultPath = cache.defaultPath / "symbols.sqlite"
+
+'''
+Schema of the symbol index. Names are compared regardless of case, as in TorqueScript
+'''
+schema = """
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    hash        TEXT NOT NULL,
+    error       TEXT
+);
+CREATE TABLE IF NOT EXISTS functions (
+    id          INTEGER PRIMARY KEY,
+    file        INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name        TEXT NOT NULL COLLATE NOCASE,
+    namespace   TEXT NOT NULL COLLATE NOCASE,
+    package     TEXT NOT NULL COLLATE NOCASE,
+    argc        INTEGER NOT NULL,
+    start       INTEGER NOT NULL,
+    end         INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    id          INTEGER PRIMARY KEY,
+    file        INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    caller      INTEGER REFERENCES functions(id) ON DELETE CASCADE,
+    name        TEXT NOT NULL COLLATE NOCASE,
+    namespace   TEXT NOT NULL COLLATE NOCASE,
+    callType    TEXT NOT NULL,
+    ip          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS functionsByName ON functions (name, namespace);
+CREATE INDEX IF NOT EXISTS functionsByNamespace ON functions (namespace);
+CREATE INDEX IF NOT EXISTS functionsByFile ON functions (file);
+CREATE INDEX IF NOT EXISTS callsByName ON calls (name, namespace);
+CREATE INDEX IF NOT EXISTS callsByFile ON calls (file);
+"""
+
+'''
+Computes the hash of a DSO file, to know if it changed since it was indexed
+@param  data    Contents of DSO file
+'''
+def getHash(data):
+    return sha256(data).hexdigest()
+
+'''
+Lists the function declarations and calls of a parsed DSO file. Everything needed is in the operands of OP_FUNC_DECL and
+OP_CALLFUNC(_RESOLVE), so the disassembly is scanned instead of building the syntax tree, resolving names from the global
+string table as Decoding.opFuncDecl and Decoding.opCallfunc do
+@param  dsoFile     Parsed dso.File object
+@return tuple       List of declarations (name, namespace, package, argc, start, end) and list of calls (name, namespace,
+                    call type, byte index, index of declaration of calling function or None if at top level)
+'''
+def scan(dsoFile):
+    instructions = dsoFile.disassemble()
+    table = dsoFile.globalStringTable
+    idxTable = dsoFile.byteCode.idxTable
+
+    funcDecl = opByName['OP_FUNC_DECL']
+    callOps = (opByName['OP_CALLFUNC'], opByName['OP_CALLFUNC_RESOLVE'])
+
+    functions = []
+    calls = []
+
+    # Indexes of declarations of enclosing functions, innermost last:
+    scopes = []
+
+    for idx in range(0, len(instructions)):
+        ip = instructions.ips[idx]
+        opCode = instructions.opcodes[idx]
+
+        while scopes and ip >= functions[scopes[-1]][5]:
+            scopes.pop()
+
+        if opCode == funcDecl:
+            operands = instructions.getOperands(idx)
+            functions.append((
+                getString(table, operands[0]),
+                getString(table, operands[1]) if operands[1] else "",
+                getString(table, operands[2]),
+                operands[5],
+                ip,
+                idxTable[operands[4]] if operands[4] < len(idxTable) else dsoFile.byteCode.binLen
+            ))
+            scopes.append(len(functions) - 1)
+        elif opCode in callOps:
+            operands = instructions.getOperands(idx)
+            calls.append((
+                getString(table, operands[0]),
+                getString(table, operands[1]) if operands[1] else "",
+                torque.FuncCall.callTypes.get(operands[2], str(operands[2])),
+                ip,
+                scopes[-1] if scopes else None
+            ))
+
+    return functions, calls
+
+'''
+Retrieves a string of a string table by offset
+@param  table   dso.StringTable
+@param  offset  Offset of string
+@return string  Decoded string
+'''
+def getString(table, offset):
+    return table[offset].decode(errors="replace")
+
+'''
+Lists the symbols of a DSO file (to be run in a worker process)
+@param  path    Path of file
+@return tuple   Declarations and calls (see scan)
+'''
+def scanFile(path):
+    myFile = dso.File(path)
+    myFile.parse()
+    return scan(myFile)
+
+
+'''
+Persistent index of function declarations and calls of DSO files, stored as an SQLite database. Files are re-indexed only
+when their hash changes, and everything is dropped if the version of the decompiler changes
+'''
+class Index:
+    '''
+    Constructs an Index object, creating the database if needed
+    @param  path    Path of database (default defaultPath)
+    '''
+    def __init__(self, path=defaultPath):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(schema)
+
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != __version__:
+            with self.db:
+                self.db.execute("DELETE FROM files")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (__version__,))
+
+    '''
+    Checks if a file is indexed with the given hash
+    @param  path    Path of file
+    @param  hash    Hash of file
+    '''
+    def isCurrent(self, path, hash):
+        row = self.db.execute("SELECT hash FROM files WHERE path = ?", (str(path),)).fetchone()
+        return row is not None and row[0] == hash
+
+    '''
+    Replaces the symbols of a file
+    @param  path        Path of file
+    @param  hash        Hash of file
+    @param  functions   List of declarations (see scan)
+    @param  calls       List of calls (see scan)
+    @param  error       Error that prevented the file to be scanned (default None)
+    '''
+    def update(self, path, hash, functions, calls, error=None):
+        with self.db:
+            self.db.execute("DELETE FROM files WHERE path = ?", (str(path),))
+            fileId = self.db.execute("INSERT INTO files (path, hash, error) VALUES (?, ?, ?)",
+                (str(path), hash, error)).lastrowid
+
+            ids = []
+            for function in functions:
+                ids.append(self.db.execute(
+                    "INSERT INTO functions (file, name, namespace, package, argc, start, end) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (fileId,) + tuple(function)).lastrowid)
+
+            self.db.executemany(
+                "INSERT INTO calls (file, caller, name, namespace, callType, ip) VALUES (?, ?, ?, ?, ?, ?)",
+                [ (fileId, ids[caller] if caller is not None else None, name, namespace, callType, ip)
+                    for name, namespace, callType, ip, caller in calls ])
+
+    '''
+    Drops files that do not exist anymore
+    @return int     Number of files dropped
+    '''
+    def prune(self):
+        gone = [ (path,) for path, in self.db.execute("SELECT path FROM files") if not Path(path).is_file() ]
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+
+        return len(gone)
+
+    '''
+    Finds declarations of a function
+    @param  name        Name of function
+    @param  namespace   Namespace of function (default None, any)
+    @return list        List of (path, namespace, name, package, argc, start, end)
+    '''
+    def getDeclarations(self, name, namespace=None):
+        query = """
+            SELECT files.path, functions.namespace, functions.name, functions.package, functions.argc, functions.start,
+                functions.end
+            FROM functions JOIN files ON files.id = functions.file
+            WHERE functions.name = ?"""
+        return self.select(query, "functions", name, namespace)
+
+    '''
+    Finds calls of a function
+    @param  name        Name of function
+    @param  namespace   Namespace of function (default None, any)
+    @return list        List of (path, namespace, name, call type, byte index, namespace and name of calling function)
+    '''
+    def getCalls(self, name, namespace=None):
+        query = """
+            SELECT files.path, calls.namespace, calls.name, calls.callType, calls.ip, functions.namespace, functions.name
+            FROM calls JOIN files ON files.id = calls.file LEFT JOIN functions ON functions.id = calls.caller
+            WHERE calls.name = ?"""
+        return self.select(query, "calls", name, namespace)
+
+    '''
+    Runs a query for a name, and namespace if given, ordered by file and position
+    @param  query       Query, filtering by name
+    @param  table       Table being queried
+    @param  name        Name of function
+    @param  namespace   Namespace of function (None for any)
+    @return list        List of rows
+    '''
+    def select(self, query, table, name, namespace):
+        params = [name]
+        if namespace is not None:
+            query += " AND {}.namespace = ?".format(table)
+            params.append(namespace)
+        query += " ORDER BY files.path, {}".format("functions.start" if table == "functions" else "calls.ip")
+
+        return self.db.execute(query, params).fetchall()
+
+    '''
+    Counts indexed files, declarations and calls
+    @return dict    Counts by table
+    '''
+    def count(self):
+        return { table: self.db.execute("SELECT COUNT(*) FROM " + table).fetchone()[0]
+            for table in ("files", "functions", "calls") }
+
+    '''
+    Closes the database
+    '''
+    def close(self):
+        self.db.close()
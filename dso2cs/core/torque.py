@@ -1,56 +1,301 @@
 from sys import stdout
 
+'''
+Computes the structural hash of a value (operation, statement, list of those or plain value)
+@param  value   Value to be hashed
+'''
+def getHash(value):
+    if isinstance(value, (Operation, Node)):
+        return value.getHash()
+    elif isinstance(value, list):
+        return hash(tuple(getHash(v) for v in value))
+
+    try:
+        return hash((type(value), value))
+    except TypeError:
+        return hash(type(value))
+
+'''
+Checks if two values have the same structure, which implies equal string representations (the converse does not hold, e.g.
+for a negated comparison and the inverse comparison)
+@param  a   First value
+@param  b   Second value
+'''
+def isSame(a, b):
+    if a is b:
+        return True
+    elif type(a) is not type(b):
+        return False
+    elif isinstance(a, Operation):
+        return a.getHash() == b.getHash() and a.isString == b.isString and isSame(a.operands, b.operands)
+    elif isinstance(a, Node):
+        return all(isSame(getattr(a, field, None), getattr(b, field, None)) for field in a.fields)
+    elif isinstance(a, list):
+        return len(a) == len(b) and all(isSame(x, y) for x, y in zip(a, b))
+    else:
+        # Plain values are the same if rendered the same (e.g. 0.0 and -0.0 are not):
+        return str(a) == str(b)
+
+'''
+Checks if a value (operation, list of those or plain value) contains a statement, e.g. a function call among operands.
+Statements are not tracked for changes, so renderings depending on them are not cached
+@param  value   Value to be checked
+'''
+def hasStatement(value):
+    if isinstance(value, Node):
+        return True
+    elif isinstance(value, Operation):
+        # Only renderings without statements are cached:
+        return value.rendered is None and hasStatement(value.operands)
+    elif isinstance(value, list):
+        return any(hasStatement(v) for v in value)
+    else:
+        return False
+
+'''
+Renders operands joined by a separator, as the operation with that separator would, without constructing one (which
+would link it to the operands for good)
+@param  separator   Separator, e.g. ", "
+@param  operands    List of operands
+@return string      String representation
+'''
+def joinOperands(separator, operands):
+    return separator.join(str(op) for op in operands)
+
+'''
+List of operands of an operation, invalidating renderings of the operation (and of operations containing it) on in place
+changes
+'''
+class Operands(list):
+    __slots__ = ("owner",)
+
+    '''
+    Constructs an Operands object
+    @param  values  Operands
+    @param  owner   Operation the operands belong to (None while unpickling, restored with the state)
+    '''
+    def __init__(self, values, owner):
+        # Inherit all characteristics of a list:
+        super().__init__(values)
+
+        self.owner = owner
+        if owner is not None:
+            self.adopt(self)
+
+    '''
+    Pickles owner as state, so that it is set after the operands (operations keep their own links to their owners)
+    '''
+    def __reduce__(self):
+        return (type(self), (list(self), None), (None, {"owner": self.owner}))
+
+    '''
+    Links operations among given operands to the owner, so that changes to them invalidate its rendering too
+    @param  values  Operands
+    '''
+    def adopt(self, values):
+        for value in values:
+            if isinstance(value, Operation):
+                if value.owners is None:
+                    value.owners = [self.owner]
+                else:
+                    value.owners.append(self.owner)
+
+    '''
+    Unlinks operations among given operands from the owner (once each, as an operation may be in the operands more than
+    once), as they are removed from the operands
+    @param  values  Operands
+    '''
+    def disown(self, values):
+        for value in values:
+            if isinstance(value, Operation) and value.owners is not None:
+                for idx, owner in enumerate(value.owners):
+                    if owner is self.owner:
+                        del value.owners[idx]
+                        break
+
+    '''
+    Invalidates rendering of owner after a change
+    @param  values  Operands added by the change, if any
+    '''
+    def changed(self, values=()):
+        self.owner.invalidate()
+        self.adopt(values)
+
+    def append(self, value):
+        self.changed((value,))
+        super().append(value)
+
+    def extend(self, values):
+        values = list(values)
+        self.changed(values)
+        super().extend(values)
+
+    def insert(self, idx, value):
+        self.changed((value,))
+        super().insert(idx, value)
+
+    def pop(self, idx=-1):
+        self.changed()
+        value = super().pop(idx)
+        self.disown((value,))
+        return value
+
+    def remove(self, value):
+        self.changed()
+        idx = self.index(value)
+        self.disown((self[idx],))
+        super().__delitem__(idx)
+
+    def clear(self):
+        self.changed()
+        self.disown(self)
+        super().clear()
+
+    def reverse(self):
+        self.changed()
+        super().reverse()
+
+    def sort(self, **kwargs):
+        self.changed()
+        super().sort(**kwargs)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            value = list(value)
+            removed = self[key]
+            self.changed(value)
+        else:
+            removed = (self[key],)
+            self.changed((value,))
+        self.disown(removed)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        removed = self[key] if isinstance(key, slice) else (self[key],)
+        self.changed()
+        self.disown(removed)
+        super().__delitem__(key)
+
+    def __iadd__(self, values):
+        values = list(values)
+        self.changed(values)
+        return super().__iadd__(values)
+
+    def __imul__(self, count):
+        self.changed(list(self) * (count - 1) if count > 1 else ())
+        if count < 1:
+            self.disown(self)
+        return super().__imul__(count)
+
+
 '''
 Template for TorqueScript operation
 '''
 class Operation:
+    # No per-instance dictionary, there are lots of these:
+    __slots__ = ("operands", "hash", "hashLen", "stringOperand", "rendered", "owners")
+
     # By default, not included in any category:
     isArithmetic = False
     isBoolean = False
     isBitwise = False
-    isString = False
     isAccess = False
 
     '''
     Constructs an Operation object
-    @param  operands    List of operands
+    @param  operands    List of operands (copied, so changes to it are tracked)
     '''
     def __init__(self, operands):
-        self.operands = operands
-        
+        # Operations containing this one, whose renderings depend on it (None if none):
+        self.owners = None
+
+        # Cached string representation:
+        self.rendered = None
+
+        self.operands = Operands(operands, self) if isinstance(operands, list) else operands
+
+        # Structural hash and number of operands it was computed for (operands are appended to while decoding):
+        self.hash = None
+        self.hashLen = 0
+
+        # Operations on a string comparison are string operations too:
+        self.stringOperand = False
         try:
             if isinstance(operands[0], StringEqual):
-                self.isString = operands[0].isString
+                self.stringOperand = operands[0].isString
         except:
             pass
+
+    '''
+    Indicates if it is a string operation (string operation classes override this with True)
+    '''
+    @property
+    def isString(self):
+        return self.stringOperand
+
+    '''
+    Retrieves structural hash of operation, computed once unless operands are appended to
+    '''
+    def getHash(self):
+        if self.hash is None or self.hashLen != len(self.operands):
+            self.hash = hash((type(self), tuple(getHash(op) for op in self.operands)))
+            self.hashLen = len(self.operands)
+
+        return self.hash
+
     '''
     Equal operator override
     @params obj     Object to compare this instance with
     '''
     def __eq__(self, obj):
-        # Two statements are equal if their string representations are equal:
-        return str(self) == str(obj)
+        # Two statements are equal if their string representations are equal (the same structure is a shortcut):
+        return isSame(self, obj) or str(self) == str(obj)
+
+    '''
+    Drops cached rendering of operation and of operations containing it, as its operands changed
+    '''
+    def invalidate(self):
+        self.rendered = None
+        if self.owners is not None:
+            for owner in self.owners:
+                owner.invalidate()
+
+    '''
+    String representation override, rendered once unless operands (of this or any operation it contains) change, or
+    every time if it contains statements
+    '''
+    def __str__(self):
+        if self.rendered is not None:
+            return self.rendered
+
+        rendered = self.render()
+        if not hasStatement(self.operands):
+            self.rendered = rendered
+
+        return rendered
 
 
 '''
 TorqueScript Add operation
 '''
 class Add(Operation):
+    __slots__ = ()
     isArithmetic = True
 
     '''
-    String representation override
+    Renders string representation
     '''
-    def __str__(self):
+    def render(self):
         return " + ".join(str(op) for op in self.operands)
 
 class AddPP(Operation):
+    __slots__ = ()
     isArithmetic = True
 
     '''
-    String representation override
+    Renders string representation
     '''
-    def __str__(self):
+    def render(self):
         return str(self.operands[0]) + "++"
 
 
@@ -58,29 +303,32 @@ class AddPP(Operation):
 TorqueScript Subtraction operation
 '''
 class Sub(Operation):
+    __slots__ = ()
     isArithmetic = True
 
 
-    def __str__(self):
+    def render(self):
         return " - ".join(str(op) for op in self.operands)
 
 class SubPP(Operation):
+    __slots__ = ()
     isArithmetic = True
 
     '''
-    String representation override
+    Renders string representation
     '''
-    def __str__(self):
+    def render(self):
         return str(self.operands[0]) + "--"
 
 '''
 TorqueScript Multiply operation
 '''
 class Mul(Operation):
+    __slots__ = ()
     isArithmetic = True
 
 
-    def __str__(self):
+    def render(self):
         br = []
         for op in self.operands:
             if isinstance(op, Add) or isinstance(op, Sub):
@@ -94,10 +342,11 @@ class Mul(Operation):
 TorqueScript Division operation
 '''
 class Div(Operation):
+    __slots__ = ()
     isArithmetic = True
 
 
-    def __str__(self):
+    def render(self):
         br = []
         for op in self.operands:
             if isinstance(op, Add) or isinstance(op, Sub):
@@ -111,10 +360,11 @@ class Div(Operation):
 TorqueScript Modulo operation
 '''
 class Mod(Operation):
+    __slots__ = ()
     isArithmetic = True
 
 
-    def __str__(self):
+    def render(self):
         return " % ".join(str(op) for op in self.operands)
 
 
@@ -122,10 +372,11 @@ class Mod(Operation):
 TorqueScript Modulo operation
 '''
 class Neg(Operation):
+    __slots__ = ()
     isArithmetic = True
 
 
-    def __str__(self):
+    def render(self):
         #if isinstance(self.operands[0], float):
         ##    return "-" + str(self.operands[0])
         #elif
@@ -144,53 +395,46 @@ class Neg(Operation):
 TorqueScript Negation operation
 '''
 class Not(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         # If negates a boolean equal operation:
         if isinstance(self.operands[0], StringEqual):
             operands = self.operands[0].operands
             if self.isString:
-                operation = StringNotEqual(operands)
+                return joinOperands(" !$= ", operands)
             else:
-                operation = NotEqual(operands)
-            return str(operation)
+                return joinOperands(" != ", operands)
         # If negates a boolean not equal operation:
         elif isinstance(self.operands[0], StringNotEqual):
             operands = self.operands[0].operands
-            operation = Equal(operands)
-            return str(operation)
+            return joinOperands(" == ", operands)
         # If negates a less than operation:
         elif isinstance(self.operands[0], Less):
             operands = self.operands[0].operands
-            operation = GreaterOrEqual(operands)
-            return str(operation)
+            return joinOperands(" >= ", operands)
         # If negates a less than or equal to operation:
         elif isinstance(self.operands[0], LessOrEqual):
             operands = self.operands[0].operands
-            operation = Greater(operands)
-            return str(operation)
+            return joinOperands(" > ", operands)
         # If negates a greater than operation:
         elif isinstance(self.operands[0], Greater):
             operands = self.operands[0].operands
-            operation = LessOrEqual(operands)
-            return str(operation)
+            return joinOperands(" <= ", operands)
         # If negates a greater than or equal to operation:
         elif isinstance(self.operands[0], GreaterOrEqual):
             operands = self.operands[0].operands
-            operation = Less(operands)
-            return str(operation)
+            return joinOperands(" < ", operands)
         # If negates a string equal operation:
         elif isinstance(self.operands[0], StringEqual):
             operands = self.operands[0].operands
-            operation = StringNotEqual(operands)
-            return str(operation)
+            return joinOperands(" !$= ", operands)
         # If negates a string not equal operation:
         elif isinstance(self.operands[0], StringNotEqual):
             operands = self.operands[0].operands
-            operation = StringEqual(operands)
-            return str(operation)
+            return joinOperands(" $= ", operands)
         else:
             return "!(" + str(self.operands[0]) + ")"
 
@@ -199,10 +443,11 @@ class Not(Operation):
 TorqueScript Equal operation
 '''
 class Equal(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " == ".join(str(op) for op in self.operands)
 
 
@@ -210,10 +455,11 @@ class Equal(Operation):
 TorqueScript Not Equal operation
 '''
 class NotEqual(Operation):
+    __slots__ = ()
     isBoolean = True
     
 
-    def __str__(self):
+    def render(self):
         return " != ".join(str(op) for op in self.operands)
 
 
@@ -221,10 +467,11 @@ class NotEqual(Operation):
 TorqueScript Less Than operation
 '''
 class Less(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " < ".join(str(op) for op in self.operands)
 
 
@@ -232,10 +479,11 @@ class Less(Operation):
 TorqueScript Less Than Or Equal To operation
 '''
 class LessOrEqual(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " <= ".join(str(op) for op in self.operands)
 
 
@@ -243,10 +491,11 @@ class LessOrEqual(Operation):
 TorqueScript Greater Than operation
 '''
 class Greater(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " > ".join(str(op) for op in self.operands)
 
 
@@ -254,10 +503,11 @@ class Greater(Operation):
 TorqueScript Greater Than Or Equal To operation
 '''
 class GreaterOrEqual(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " >= ".join(str(op) for op in self.operands)
 
 
@@ -265,10 +515,11 @@ class GreaterOrEqual(Operation):
 TorqueScript And operation
 '''
 class And(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " && ".join(str(op) for op in self.operands)
 
 
@@ -276,10 +527,11 @@ class And(Operation):
 TorqueScript Or operation
 '''
 class Or(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " || ".join(str(op) for op in self.operands)
 
 
@@ -287,10 +539,11 @@ class Or(Operation):
 TorqueScript One's Complement operation
 '''
 class Complement(Operation):
+    __slots__ = ()
     isBoolean = True
 
 
-    def __str__(self):
+    def render(self):
         return " ~ ".join(str(op) for op in self.operands)
 
 
@@ -298,10 +551,11 @@ class Complement(Operation):
 TorqueScript Bitwise And operation
 '''
 class BitAnd(Operation):
+    __slots__ = ()
     isBitwise = True
 
 
-    def __str__(self):
+    def render(self):
         return " & ".join(str(op) for op in self.operands)
 
 
@@ -309,10 +563,11 @@ class BitAnd(Operation):
 TorqueScript Bitwise Or operation
 '''
 class BitOr(Operation):
+    __slots__ = ()
     isBitwise = True
 
 
-    def __str__(self):
+    def render(self):
         return " | ".join(str(op) for op in self.operands)
 
 
@@ -320,10 +575,11 @@ class BitOr(Operation):
 TorqueScript Bitwise Xor operation
 '''
 class Xor(Operation):
+    __slots__ = ()
     isBitwise = True
 
 
-    def __str__(self):
+    def render(self):
         return " ^ ".join(str(op) for op in self.operands)
 
 
@@ -331,10 +587,11 @@ class Xor(Operation):
 TorqueScript Shift Left operation
 '''
 class ShiftLeft(Operation):
+    __slots__ = ()
     isBitwise = True
 
 
-    def __str__(self):
+    def render(self):
         return " << ".join(str(op) for op in self.operands)
 
 
@@ -342,10 +599,11 @@ class ShiftLeft(Operation):
 TorqueScript Shift Right operation
 '''
 class ShiftRight(Operation):
+    __slots__ = ()
     isBitwise = True
 
 
-    def __str__(self):
+    def render(self):
         return " >> ".join(str(op) for op in self.operands)
 
 
@@ -353,10 +611,11 @@ class ShiftRight(Operation):
 TorqueScript String Equal operation
 '''
 class StringEqual(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " $= ".join(str(op) for op in self.operands)
 
 
@@ -364,10 +623,11 @@ class StringEqual(Operation):
 TorqueScript String Not Equal operation
 '''
 class StringNotEqual(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " !$= ".join(str(op) for op in self.operands)
 
 
@@ -375,10 +635,11 @@ class StringNotEqual(Operation):
 TorqueScript String Concatenation operation
 '''
 class Concat(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " @ ".join(str(op) for op in self.operands)
 
 
@@ -386,10 +647,11 @@ class Concat(Operation):
 TorqueScript String Newline Concatenation operation
 '''
 class ConcatNl(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " NL ".join(str(op) for op in self.operands)
 
 
@@ -397,10 +659,11 @@ class ConcatNl(Operation):
 TorqueScript String Tab Concatenation operation
 '''
 class ConcatTab(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " TAB ".join(str(op) for op in self.operands)
 
 
@@ -408,10 +671,11 @@ class ConcatTab(Operation):
 TorqueScript String Space Concatenation operation
 '''
 class ConcatSpc(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return " SPC ".join(str(op) for op in self.operands)
 
 
@@ -419,10 +683,11 @@ class ConcatSpc(Operation):
 TorqueScript String Comma Concatenation operation (for array access)
 '''
 class ConcatComma(Operation):
+    __slots__ = ()
     isString = True
 
 
-    def __str__(self):
+    def render(self):
         return ", ".join(str(op) for op in self.operands)
 
 
@@ -430,10 +695,11 @@ class ConcatComma(Operation):
 TorqueScript Array Access operation
 '''
 class ArrayAccess(Operation):
+    __slots__ = ()
     isAccess = True
 
 
-    def __str__(self):
+    def render(self):
         try:
             return str(self.operands[0]) + "[" + str(int(eval(self.operands[1]))) + "]"
         except:
@@ -443,23 +709,38 @@ class ArrayAccess(Operation):
 TorqueScript Field Access operation
 '''
 class FieldAccess(Operation):
+    __slots__ = ()
     isAccess = True
 
 
-    def __str__(self):
+    def render(self):
         return ".".join(str(op) for op in self.operands)
 
 
+'''
+Empty list of children of a node
+'''
+noChildren = ()
+
 '''
 Template class for a node of the tree
 '''
 class Node:
+    # No per-instance dictionary, there are lots of these:
+    __slots__ = ("parent", "idx", "children", "block", "is_object")
+
+    # Attributes string representation depends on:
+    fields = ()
+
     '''
     Constructs a Node object
     '''
     def __init__(self):
         self.parent = None
-        self.children = []
+        # Index on parent's children list:
+        self.idx = None
+        # Shared by every node until it gets a child (most never do):
+        self.children = noChildren
         self.block = False
         self.is_object = False
 
@@ -468,8 +749,14 @@ class Node:
     @params obj     Object to compare this instance with
     '''
     def __eq__(self, obj):
-        # Two statements are equal if their string representations are equal:
-        return str(self) == str(obj)
+        # Two statements are equal if their string representations are equal (the same structure is a shortcut):
+        return isSame(self, obj) or str(self) == str(obj)
+
+    '''
+    Retrieves structural hash of statement (not cached, as attributes get reassigned while decoding)
+    '''
+    def getHash(self):
+        return hash((type(self), tuple(getHash(getattr(self, field, None)) for field in self.fields)))
 
     '''
     Appends the given node to the children list
@@ -477,6 +764,9 @@ class Node:
     '''
     def append(self, child):
         child.parent = self
+        if self.children is noChildren:
+            self.children = []
+        child.idx = len(self.children)
         self.children.append(child)
 
 
@@ -484,6 +774,9 @@ class Node:
 TorqueScript assignment
 '''
 class Assignment(Node):
+    __slots__ = ("left", "right")
+    fields = ("left", "right")
+
     '''
     Constructs an Assignment object
     @param  left    Left operand of assignment
@@ -519,6 +812,7 @@ class Assignment(Node):
 TorqueScript break from loop statement
 '''
 class Break(Node):
+    __slots__ = ()
     '''
     Constructs an Assignment object
     '''
@@ -538,6 +832,7 @@ class Break(Node):
 TorqueScript else statement
 '''
 class Else(Node):
+    __slots__ = ()
     '''
     Constructs an Assignment object
     '''
@@ -557,6 +852,9 @@ class Else(Node):
 File information header comment (also root of tree)
 '''
 class File(Node):
+    __slots__ = ("name",)
+    fields = ("name",)
+
     '''
     Constructs a File object
     @param  name    Name of the file being decompiled
@@ -575,6 +873,9 @@ class File(Node):
 TorqueScript function call
 '''
 class FuncCall(Node):
+    __slots__ = ("name", "namespace", "callType", "objName", "argv")
+    fields = ("name", "namespace", "callType", "objName", "argv")
+
     callTypes = {
         0:  "Function",
         1:  "Method",
@@ -619,13 +920,16 @@ class FuncCall(Node):
         if self.callTypes[self.callType] == "Method":
             baseStr += str(self.objName) + "."
 
-        return baseStr + self.name + "(" + str(ConcatComma(self.argv)) + ")"
+        return baseStr + self.name + "(" + joinOperands(", ", self.argv) + ")"
 
 
 '''
 TorqueScript function declaration
 '''
 class FuncDecl(Node):
+    __slots__ = ("name", "namespace", "package", "hasBody", "end", "argc", "argv")
+    fields = ("name", "namespace", "argv")
+
     '''
     Constructs a FuncDecl object
     @param  name        Name of the function being declared
@@ -654,15 +958,18 @@ class FuncDecl(Node):
 
     def __str__(self):
         if self.namespace == "":
-            return "function " + self.name + "(" + str(ConcatComma(self.argv)) + ")"
+            return "function " + self.name + "(" + joinOperands(", ", self.argv) + ")"
         else:
-            return "function " + self.namespace + "::" + self.name + "(" + str(ConcatComma(self.argv)) + ")"
+            return "function " + self.namespace + "::" + self.name + "(" + joinOperands(", ", self.argv) + ")"
 
 
 '''
 TorqueScript if statement
 '''
 class If(Node):
+    __slots__ = ("condition", "elseHandle")
+    fields = ("condition",)
+
     '''
     Constructs an If object
     @param  condition   Condition of if statement
@@ -688,6 +995,9 @@ class If(Node):
 TorqueScript object creation
 '''
 class ObjCreation(Node):
+    __slots__ = ("parentName", "is_dblock", "objType", "argv")
+    fields = ("is_dblock", "objType", "argv")
+
     '''
     Constructs ObjCreation object
     @param  parentName  Name of parent object
@@ -718,15 +1028,18 @@ class ObjCreation(Node):
 
     def __str__(self):
         if self.is_dblock:
-            return "datablock " + self.objType + "( " + str(ConcatComma(self.argv)) + " )"
+            return "datablock " + self.objType + "( " + joinOperands(", ", self.argv) + " )"
         else:
-            return "new " + self.objType + "( " + str(ConcatComma(self.argv)) + " )"
+            return "new " + self.objType + "( " + joinOperands(", ", self.argv) + " )"
 
 
 '''
 TorqueScript return statement
 '''
 class Return(Node):
+    __slots__ = ("value",)
+    fields = ("value",)
+
     '''
     Constructs a Return object
     @param  value   Return value
@@ -748,6 +1061,9 @@ class Return(Node):
 TorqueScript while statement
 '''
 class While(Node):
+    __slots__ = ("condition",)
+    fields = ("condition",)
+
     '''
     Constructs an While object
     @param  condition   Condition of while statement
@@ -781,6 +1097,8 @@ class Tree:
         self.curNode = root
         # Characters to be prepended to each line of code for indentation:
         self.indent = ""
+        # Indicates if root has been formatted already by flush:
+        self.flushed = False
 
     '''
     Appends a node to the current node of the tree
@@ -801,7 +1119,12 @@ class Tree:
 
         # Replace reference on parent's children list:
         if parent is not None:
-            parent.children[parent.children.index(old)] = new
+            idx = old.idx
+            # Index is only stale if children list was rearranged by hand, look for the very same node then:
+            if idx is None or idx >= len(parent.children) or parent.children[idx] is not old:
+                idx = next(i for i, child in enumerate(parent.children) if child is old)
+            parent.children[idx] = new
+            new.idx = idx
 
         # Replace references on children's parent field:
         for child in children:
@@ -838,41 +1161,70 @@ class Tree:
         return self.curNode
 
     '''
-    Formats tree as text (source code)
+    Formats tree as text (source code), from current node, walking it with an explicit stack (so depth is not bound by
+    recursion limit) and writing output in chunks
     @param  sink    Stream to dump output to (default stdout)
+    @param  chunk   Number of pieces of text to gather before each write (default 4096)
     '''
-    def format(self, sink=stdout):
-        # Get current node:
-        thisNode = self.curNode
-
-        # Print indented line of code:
-        print(self.indent + str(thisNode), end="", file=sink)
-
-        # If declares a block:
-        if thisNode.block:
-            # Print newline:
-            print("", file=sink)
-            # Open brackets:
-            print(self.indent + "{", file=sink)
-            # Indent:
-            self.indent += "\t" * thisNode.block
-        else:
-            print(";", file=sink)
-
-        # Call recursively for all children:
-        for child in thisNode.children:
-            self.curNode = child
-            self.format(sink=sink)
-
-        # If declares a block:
-        if thisNode.block:
-            # Unindent:
-            self.indent = self.indent[:-thisNode.block]
-            # Close brackets (objects need "};" ) :
-            if thisNode.is_object:
-                print(self.indent + "};", file=sink)
-            else:
-                print(self.indent + "}", file=sink)
+    def format(self, sink=stdout, chunk=4096):
+        self.write([(self.curNode, self.indent)], sink, chunk)
+
+    '''
+    Formats children of root appended so far and releases them, so a tree can be formatted while it is still growing
+    (root itself is formatted on first call, and must not declare a block)
+    @param  sink    Stream to dump output to (default stdout)
+    @param  chunk   Number of pieces of text to gather before each write (default 4096)
+    '''
+    def flush(self, sink=stdout, chunk=4096):
+        if not self.flushed:
+            sink.write(self.indent + str(self.root) + ";\n")
+            self.flushed = True
 
-        # Restore current node:
-        self.curNode = thisNode
+        children = self.root.children
+        self.root.children = noChildren
+
+        self.write([(child, self.indent) for child in reversed(children)], sink, chunk)
+
+    '''
+    Formats nodes as text (source code)
+    @param  stack   Nodes to be formatted, last one first, along with their indentation
+    @param  sink    Stream to dump output to
+    @param  chunk   Number of pieces of text to gather before each write
+    '''
+    def write(self, stack, sink, chunk):
+        # Pieces of text not yet written:
+        pieces = []
+
+        try:
+            while stack:
+                thisNode, indent = stack.pop()
+
+                # Closing brackets (stacked as text in place of indentation):
+                if thisNode is None:
+                    pieces.append(indent)
+                    continue
+
+                # Indented line of code:
+                pieces.append(indent + str(thisNode))
+
+                # If declares a block:
+                if thisNode.block:
+                    # Open brackets:
+                    pieces.append("\n" + indent + "{\n")
+                    # Close brackets after children (objects need "};" ):
+                    stack.append((None, indent + ("};\n" if thisNode.is_object else "}\n")))
+                    # Indent:
+                    indent += "\t" * thisNode.block
+                else:
+                    pieces.append(";\n")
+
+                # Children, in reverse so the first one is formatted first:
+                for child in reversed(thisNode.children):
+                    stack.append((child, indent))
+
+                if len(pieces) >= chunk:
+                    sink.write("".join(pieces))
+                    pieces.clear()
+        finally:
+            # Write whatever was formatted, even if formatting failed (partial output):
+            sink.write("".join(pieces))
@@ -0,0 +1,54 @@
+from sys import stdout
+import logging
+
+'''
+Tracer of decoding steps, represented as a list of sinks (callables that take a message). A tracer without sinks is false,
+so callers can skip building messages altogether with a single check
+'''
+class Tracer(list):
+    '''
+    Constructs a Tracer object
+    @param  sinks   Sinks to dispatch messages to
+    '''
+    def __init__(self, *sinks):
+        # Inherit all characteristics of a list:
+        super().__init__(sinks)
+
+    '''
+    Dispatches a message to every sink
+    @param  message     Message to be dispatched
+    '''
+    def emit(self, message):
+        for sink in self:
+            sink(message)
+
+
+'''
+Sink that forwards messages to the logging module
+'''
+class LoggingSink:
+    '''
+    Constructs a LoggingSink object
+    @param  level   Logging level of the messages (default DEBUG)
+    '''
+    def __init__(self, level=logging.DEBUG):
+        self.level = level
+
+    def __call__(self, message):
+        # Report the line that emitted the message, not this one:
+        logging.log(self.level, message, stacklevel=3)
+
+
+'''
+Sink that prints messages to a stream
+'''
+class StreamSink:
+    '''
+    Constructs a StreamSink object
+    @param  stream  Stream to print messages to (default stdout)
+    '''
+    def __init__(self, stream=stdout):
+        self.stream = stream
+
+    def __call__(self, message):
+        print(message, file=self.stream)
@@ -1,13 +1,17 @@
 #! /usr/bin/env python3
 
 import argparse
+import json
 import logging
+import re
 
 from pathlib import Path
-from os import remove
-from sys import stdout, stderr
+from os import remove, open as openFd, devnull, dup2, O_WRONLY
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from sys import argv, stdout, stderr
 
-from core import dso, codec
+from core import dso, codec, parallel, cache, stats, profiler, search, symbols
 
 def compare_dso(file1, file2):
     files = {file1:[], file2:[]}
@@ -42,97 +46,681 @@ def getArgs():
         default=False,
         help="compare two DSO files"
     )
+    parser.add_argument(
+        "--mmap",
+        dest="mmap",
+        action="store_true",
+        default=False,
+        help="memory map input files instead of reading them"
+    )
+    parser.add_argument(
+        "--function-jobs",
+        dest="functionJobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="decode functions of each file in N worker processes"
+    )
+    parser.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        default=False,
+        help="write functions out as soon as they are decoded instead of keeping whole files in memory"
+    )
+    parser.add_argument(
+        "--history",
+        dest="history",
+        metavar="N",
+        type=int,
+        default=2,
+        help="log last N decoded instructions when decoding fails"
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help="write time, throughput and peak memory of each file and stage as JSON to FILE"
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        metavar="FILE",
+        type=str,
+        default=None,
+        help="write number of calls and time spent of each opcode routine as CSV (if FILE ends with .csv) or JSON to FILE"
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="decompile N files at a time in worker processes"
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        default=True,
+        help="neither use nor store decompilations in the cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cacheDir",
+        metavar="DIR",
+        type=str,
+        default=cache.defaultPath,
+        help="directory of the cache (default {})".format(cache.defaultPath)
+    )
+    parser.add_argument(
+        "--cache-size",
+        dest="cacheSize",
+        metavar="MB",
+        type=int,
+        default=256,
+        help="evict least recently used cache entries above MB megabytes (default 256)"
+    )
+    parser.add_argument(
+        "--cache-age",
+        dest="cacheAge",
+        metavar="DAYS",
+        type=int,
+        default=30,
+        help="evict cache entries unused for DAYS days (default 30)"
+    )
 
 
     opt = parser.parse_args()
 
-    return opt.fnames, opt.debug, opt.compare
+    if opt.cache:
+        myCache = cache.Cache(opt.cacheDir, opt.cacheSize * 1024 * 1024, opt.cacheAge * 24 * 60 * 60)
+    else:
+        myCache = None
 
+    return opt.fnames, opt.debug, opt.compare, opt.mmap, opt.functionJobs, opt.stream, opt.history, opt.stats, opt.profile, opt.jobs, myCache
 
-fnames, debug, compare = getArgs()
-#fnames, debug, compare = ["setup.cs.dso"], True, False
-#fnames, debug, compare = ["datablocks.cs.dso"], True, False
-#fnames, debug, compare = ["globalTuning.cs.dso"], True
-#fnames, debug, compare = ["researchScreen.cs.dso"], True
 
-if debug:
-    logging.basicConfig(level=logging.DEBUG, format="[%(levelname)s]: %(filename)s: %(lineno)d: %(message)s", stream=stdout)
-else:
-    logging.basicConfig(level=logging.INFO, format="[%(levelname)s]: %(filename)s: %(lineno)d: %(message)s", stream=stdout)
+def getGrepArgs(args):
+    parser = argparse.ArgumentParser(
+        prog="dso2cs.py grep",
+        description="search string tables of DSO files, without decompiling them"
+    )
+
+    parser.add_argument(
+        "pattern",
+        metavar="PATTERN",
+        type=str,
+        help="string to search for"
+    )
+    parser.add_argument(
+        "fnames",
+        metavar="PATH",
+        type=str,
+        nargs="+",
+        help="name of a DSO file, or of a directory to search DSO files in recursively"
+    )
+
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_const",
+        const="debug",
+        default=False,
+        help="set logging level to DEBUG"
+    )
+    parser.add_argument(
+        "-E", "--regex",
+        dest="regex",
+        action="store_true",
+        default=False,
+        help="take PATTERN as a regular expression instead of a literal string"
+    )
+    parser.add_argument(
+        "-i", "--ignore-case",
+        dest="ignoreCase",
+        action="store_true",
+        default=False,
+        help="match regardless of case"
+    )
+    parser.add_argument(
+        "--table",
+        dest="tables",
+        metavar="NAME",
+        action="append",
+        choices=list(search.tables),
+        help="string table to search (default all: {})".format(", ".join(search.tables))
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="search N files at a time in worker processes"
+    )
 
-success = []
-failed = []
+    opt = parser.parse_args(args)
 
-if compare:
     try:
-        f1, f2 = [ Path(f) for f in fnames ]
-    except:
-        logging.error('Need two DSO files for compare.'); exit(-1)
-    else:
-        dso.File(f1).compare(dso.File(f2))
-        logging.info(f'Finished comparing {f1} and {f2}')
-        exit(0)
+        pattern = search.compilePattern(opt.pattern, opt.regex, opt.ignoreCase)
+    except re.error as e:
+        parser.error("invalid regular expression: {}".format(e))
+
+    return pattern, opt.fnames, opt.debug, opt.tables or list(search.tables), opt.jobs
+
+
+def getIndexArgs(args):
+    parser = argparse.ArgumentParser(
+        prog="dso2cs.py index",
+        description="index function declarations and calls of DSO files, re-indexing only files that changed"
+    )
+
+    parser.add_argument(
+        "fnames",
+        metavar="PATH",
+        type=str,
+        nargs="+",
+        help="name of a DSO file, or of a directory to index DSO files in recursively"
+    )
+
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_const",
+        const="debug",
+        default=False,
+        help="set logging level to DEBUG"
+    )
+    parser.add_argument(
+        "--db",
+        dest="db",
+        metavar="FILE",
+        type=str,
+        default=symbols.defaultPath,
+        help="symbol index database (default {})".format(symbols.defaultPath)
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="index N files at a time in worker processes"
+    )
+
+    opt = parser.parse_args(args)
+
+    return opt.fnames, opt.debug, opt.db, opt.jobs
+
+
+def getSymbolsArgs(args):
+    parser = argparse.ArgumentParser(
+        prog="dso2cs.py symbols",
+        description="look up declarations (or calls) of a function in the symbol index"
+    )
+
+    parser.add_argument(
+        "name",
+        metavar="NAME",
+        type=str,
+        help="name of function, optionally preceded by its namespace (NAMESPACE::NAME)"
+    )
+
+    parser.add_argument(
+        "--calls",
+        dest="calls",
+        action="store_true",
+        default=False,
+        help="list calls of the function instead of its declarations"
+    )
+    parser.add_argument(
+        "--db",
+        dest="db",
+        metavar="FILE",
+        type=str,
+        default=symbols.defaultPath,
+        help="symbol index database (default {})".format(symbols.defaultPath)
+    )
+
+    opt = parser.parse_args(args)
+
+    namespace, _, name = opt.name.rpartition("::")
+
+    return name, namespace if _ else None, opt.calls, opt.db
+
+
+'''
+Decompiles a file: parses, decodes and formats it next to the original
+@param  path            Path of file
+@param  debug           Store dump of parsed file and partial decodes too
+@param  mmap            Memory map file instead of reading it
+@param  functionJobs    Number of worker processes to decode functions in (None decodes serially)
+@param  stream          Format functions as soon as they are decoded
+@param  history         Number of last decoded instructions to log on failure (serial decoding only)
+@param  profiling       Count and time opcode routines
+@param  myCache         Cache of decompilations (None disables it, which debug does too)
+@return tuple           Path, if decompilation failed (partially or not), if it produced an output, stats.Stats and
+                        profiler.Profile (None if not profiling or not decoded)
+'''
+def decompile(path, debug, mmap, functionJobs, stream, history, profiling, myCache):
+    # Indicates if file failed to be decoded or formatted:
+    failed = False
+
+    myStats = stats.Stats(path.name, path.stat().st_size if path.is_file() else None)
+
+    outPath = path.with_suffix(path.suffix + ".cs")
+
+    # Debug output can only be produced by parsing the file:
+    if myCache is not None and not debug:
+        with myStats.stage("cache"):
+            try:
+                key = myCache.key(path.name, path.read_bytes())
+            except Exception as e:
+                logging.error("Failed to read file: {}: Got exception: {}".format(path.name, repr(e)))
+                return path, True, False, myStats, None
+
+            output = myCache.get(key)
+            if output is not None:
+                outPath.write_bytes(output)
+                logging.info("Found cached decompilation of file: {}".format(path.name))
+                return path, False, True, myStats, None
 
-for path in [Path(f) for f in fnames]:
     logging.info("Parsing file: {}".format(path.name))
     try:
-        myFile = dso.File(path)
-        myFile.parse()
+        myFile = dso.File(path, mmap=mmap)
+        with myStats.stage("parse"):
+            myFile.parseSections()
+        with myStats.stage("patchStrings"):
+            myFile.patchStrings()
     except Exception as e:
         if debug: logging.exception("Failed to parse file: {}: Got exception: {}".format(path.name, repr(e)))
         else: logging.error("Failed to parse file: {}: Got exception: {}".format(path.name, repr(e)))
-        failed.append(path)
-        continue
+        return path, True, False, myStats, None
 
     logging.info("Successfully parsed file: {}".format(path.name))
 
     if debug:
-        outPath = path.with_suffix(path.suffix + ".txt")
-        with open(outPath, "w") as fd:
+        dumpPath = path.with_suffix(path.suffix + ".txt")
+        with open(dumpPath, "w") as fd:
             myFile.dump(sink=fd)
 
-        logging.debug("Debug enabled. Additional output stored in: {}".format(outPath))
+        logging.debug("Debug enabled. Additional output stored in: {}".format(dumpPath))
    
     logging.info("Decoding file: {}".format(path.name))
+    # When streaming, output is written while decoding:
+    streamFd = open(outPath, "w") if stream else None
+    profile = profiler.Profile() if profiling else None
+    decoder = None
     try:
-        decoder = codec.Decoding(myFile)
-        decoder.decode()
+        with myStats.stage("decode"):
+            if functionJobs:
+                decoder = parallel.ParallelDecoding(myFile, functionJobs, stream=streamFd, profile=profile)
+            else:
+                decoder = codec.Decoding(myFile, stream=streamFd, history=history, profile=profile)
+            decoder.decode()
     except Exception as e:
         if debug: 
             logging.exception("Failed to decode file: {}: Got exception: {}".format(path.name, repr(e)))
             logging.warning('Writing partial decode to file')
         else: 
             logging.error("Failed to decode file: {}: Got exception: {}".format(path.name, repr(e)))
-        failed.append(path)
+        failed = True
     else:
         logging.info("Successfully decoded file: {}".format(path.name))
+        logging.debug("Decoded string cache: {}".format(decoder.getStringCacheStats()))
+
+    # Nothing was decoded if decoding could not even start:
+    if decoder is None:
+        if stream:
+            streamFd.close()
+            remove(outPath)
+        return path, True, False, myStats, profile
+
+    myStats.setInstructions(decoder.getInstructionCount())
 
     decoder.tree.rewind()
-    outPath = path.with_suffix(path.suffix + ".cs")
 
     try:
-        if not outPath in failed or debug:
-            logging.info("Formatting file: {}".format(path.name))
-            with open(outPath, "w") as fd:
-                decoder.tree.format(sink=fd)
+        logging.info("Formatting file: {}".format(path.name))
+        with myStats.stage("format"):
+            if stream:
+                # Format whatever was not streamed yet:
+                with streamFd:
+                    decoder.tree.flush(sink=streamFd)
+            else:
+                with open(outPath, "w") as fd:
+                    decoder.tree.format(sink=fd)
     except Exception as e:
         logging.error("Failed to format file: {}: Got exception: {}".format(path.name, repr(e)))
-        failed.append(path)
         if outPath.is_file() and not debug:
             remove(outPath)
-        continue
+        return path, True, False, myStats, profile
+
+    # Only complete decompilations are cached (not profiled ones, decoded through wrapped routines):
+    if myCache is not None and not debug and not failed and not profiling:
+        try:
+            myCache.put(key, outPath.read_bytes())
+        except Exception as e:
+            logging.warning("Failed to cache decompilation of file: {}: Got exception: {}".format(path.name, repr(e)))
 
-    if path in failed and debug:
+    if failed and debug:
         logging.info("Partially formatted file: {}. Output stored in: {}".format(path.name, outPath))
-    elif path in failed:
+    elif failed:
         logging.info("Failed to format file: {}.".format(path.name))
-    
-    success.append(path)
 
-if failed:
-    logging.info("The following failed to be decompiled fully:")
+    return path, failed, True, myStats, profile
+
+'''
+Configures logging (also run in each worker process)
+@param  debug       Set logging level to DEBUG
+@param  toStderr    Log to standard error, keeping standard output for results (default False)
+'''
+def setLogging(debug, toStderr=False):
+    stream = stderr if toStderr else stdout
+    if debug:
+        logging.basicConfig(level=logging.DEBUG, format="[%(levelname)s]: %(filename)s: %(lineno)d: %(message)s", stream=stream)
+    else:
+        logging.basicConfig(level=logging.INFO, format="[%(levelname)s]: %(filename)s: %(lineno)d: %(message)s", stream=stream)
+
+'''
+Runs a function on files in a pool of worker processes, yielding results as they complete. Only a few files per worker
+are submitted at a time, so that memory stays bounded regardless of the number of files
+@param  function    Function to run, taking path of file and remaining arguments
+@param  paths       Iterable of paths of files
+@param  jobs        Number of worker processes
+@param  debug       Set logging level of workers to DEBUG
+@param  args        Remaining arguments of function
+@param  ordered     Yield results in order of paths instead (default False)
+@param  toStderr    Log to standard error in workers (default False)
+'''
+def runAll(function, paths, jobs, debug, *args, ordered=False, toStderr=False):
+    with ProcessPoolExecutor(jobs, initializer=setLogging, initargs=(debug, toStderr)) as executor:
+        if ordered:
+            pending = deque()
+            for path in paths:
+                if len(pending) >= 2 * jobs:
+                    yield pending.popleft().result()
+
+                pending.append(executor.submit(function, path, debug, *args))
+
+            for future in pending:
+                yield future.result()
+            return
+
+        pending = set()
+        for path in paths:
+            if len(pending) >= 2 * jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+            pending.add(executor.submit(function, path, debug, *args))
+
+        for future in as_completed(pending):
+            yield future.result()
+
+'''
+Searches string tables of a file
+@param  path        Path of file
+@param  debug       Log tracebacks of failures
+@param  pattern     Compiled bytes pattern
+@param  tables      Names of tables to be searched
+@return tuple       Path and list of hits (table, offset, string), None if file failed to be parsed
+'''
+def grepFile(path, debug, pattern, tables):
+    try:
+        return path, search.searchFile(path, pattern, tables)
+    except Exception as e:
+        if debug: logging.exception("Failed to parse file: {}: Got exception: {}".format(path, repr(e)))
+        else: logging.error("Failed to parse file: {}: Got exception: {}".format(path, repr(e)))
+        return path, None
+
+'''
+Lists symbols of a file
+@param  path        Path of file
+@param  debug       Log tracebacks of failures
+@return tuple       Path, declarations, calls (see symbols.scan) and error (None if file was scanned)
+'''
+def indexFile(path, debug):
+    try:
+        functions, calls = symbols.scanFile(path)
+    except Exception as e:
+        if debug: logging.exception("Failed to index file: {}: Got exception: {}".format(path, repr(e)))
+        else: logging.error("Failed to index file: {}: Got exception: {}".format(path, repr(e)))
+        return path, [], [], repr(e)
+
+    return path, functions, calls, None
+
+'''
+Walks paths for DSO files that changed since they were indexed, each once even if reached through several paths
+@param  myIndex     symbols.Index
+@param  paths       List of paths of files and directories
+@param  hashes      Dictionary to store hashes of changed files in, by path
+'''
+def getChanged(myIndex, paths, hashes):
+    seen = set()
+    for path in search.walk(paths):
+        # Absolute paths, so that the index does not depend on the working directory:
+        path = path.resolve()
+        if path in seen:
+            continue
+        seen.add(path)
+
+        try:
+            hash = symbols.getHash(path.read_bytes())
+        except OSError as e:
+            logging.error("Failed to read file: {}: Got exception: {}".format(path, repr(e)))
+            continue
+
+        if not myIndex.isCurrent(path, hash):
+            hashes[path] = hash
+            yield path
+
+'''
+Indexes function declarations and calls of DSO files
+@param  args    Command line arguments following "index"
+@return int     Exit status: 0 if every file was indexed, 1 if not
+'''
+def index(args):
+    fnames, debug, db, jobs = getIndexArgs(args)
+
+    setLogging(debug)
+
+    myIndex = symbols.Index(db)
+
+    hashes = {}
+    paths = getChanged(myIndex, [Path(f) for f in fnames], hashes)
+    if jobs > 1:
+        results = runAll(indexFile, paths, jobs, debug)
+    else:
+        results = (indexFile(path, debug) for path in paths)
+
+    indexed = 0
+    failed = 0
+    for path, functions, calls, error in results:
+        # Failures are recorded too, so that files are not retried until they change:
+        myIndex.update(path, hashes.pop(path), functions, calls, error)
+        indexed += 1
+        failed += error is not None
+
+    pruned = myIndex.prune()
+    counts = myIndex.count()
+    myIndex.close()
+
+    logging.info("Indexed {} changed files ({} failed), dropped {} missing files".format(indexed, failed, pruned))
+    logging.info("Index holds {files} files, {functions} function declarations and {calls} calls".format(**counts))
+
+    return 1 if failed else 0
+
+'''
+Looks up declarations or calls of a function in the symbol index, printing a line for each
+@param  args    Command line arguments following "symbols"
+@return int     Exit status: 0 if anything was found, 1 if not
+'''
+def lookup(args):
+    name, namespace, calls, db = getSymbolsArgs(args)
+
+    # Symbols are printed to standard output, for piping:
+    setLogging(False, toStderr=True)
+
+    myIndex = symbols.Index(db)
+    rows = myIndex.getCalls(name, namespace) if calls else myIndex.getDeclarations(name, namespace)
+    myIndex.close()
+
+    try:
+        if calls:
+            for path, namespace, name, callType, ip, callerNamespace, callerName in rows:
+                if callerName is None:
+                    caller = "top level"
+                else:
+                    caller = callerNamespace + "::" + callerName if callerNamespace else callerName
+                print("{}:{}: {} call of {} from {}".format(path, ip, callType, namespace + "::" + name if namespace else name,
+                    caller))
+        else:
+            for path, namespace, name, package, argc, start, end in rows:
+                print("{}:{}-{}: function {}({} arguments){}".format(path, start, end,
+                    namespace + "::" + name if namespace else name, argc, " in package " + package if package else ""))
+    except BrokenPipeError:
+        # Reader is gone (e.g. output piped to head), stop quietly as it got what it wanted:
+        closeOutput()
+
+    return 0 if rows else 1
+
+'''
+Searches string tables of DSO files, printing a line (file, table, offset and string) for each hit
+@param  args    Command line arguments following "grep"
+@return int     Exit status: 0 if anything was found, 1 if not, 2 if a file failed to be parsed and nothing was found
+'''
+def grep(args):
+    pattern, fnames, debug, tables, jobs = getGrepArgs(args)
+
+    # Hits are printed to standard output, for piping:
+    setLogging(debug, toStderr=True)
+
+    paths = search.walk([Path(f) for f in fnames])
+    if jobs > 1:
+        results = runAll(grepFile, paths, jobs, debug, pattern, tables, ordered=True, toStderr=True)
+    else:
+        results = (grepFile(path, debug, pattern, tables) for path in paths)
+
+    found = False
+    failed = False
+    try:
+        for path, hits in results:
+            if hits is None:
+                failed = True
+                continue
+
+            for table, offset, string in hits:
+                print("{}:{}:{}: {}".format(path, table, offset, string.translate(search.escapes)))
+            found = found or bool(hits)
+    except BrokenPipeError:
+        # Reader is gone (e.g. output piped to head), stop quietly as it got what it wanted:
+        closeOutput()
+        return 0
+
+    return 0 if found else 2 if failed else 1
+
+'''
+Points standard output to the null device after its reader closed it, so that flushing it on exit does not fail again
+'''
+def closeOutput():
+    dup2(openFd(devnull, O_WRONLY), stdout.fileno())
+
+
+def main():
+    if argv[1:2] == ["grep"]:
+        exit(grep(argv[2:]))
+    if argv[1:2] == ["index"]:
+        exit(index(argv[2:]))
+    if argv[1:2] == ["symbols"]:
+        exit(lookup(argv[2:]))
+
+    fnames, debug, compare, mmap, functionJobs, stream, history, statsPath, profilePath, jobs, myCache = getArgs()
+    #fnames, debug, compare = ["setup.cs.dso"], True, False
+    #fnames, debug, compare = ["datablocks.cs.dso"], True, False
+    #fnames, debug, compare = ["globalTuning.cs.dso"], True
+    #fnames, debug, compare = ["researchScreen.cs.dso"], True
+
+    setLogging(debug)
+
+    success = []
+    failed = []
+
+    if compare:
+        try:
+            f1, f2 = [ Path(f) for f in fnames ]
+        except:
+            logging.error('Need two DSO files for compare.'); exit(-1)
+        else:
+            dso.File(f1, mmap=mmap).compare(dso.File(f2, mmap=mmap))
+            logging.info(f'Finished comparing {f1} and {f2}')
+            exit(0)
+
+    paths = [Path(f) for f in fnames]
+    if jobs > 1:
+        results = runAll(decompile, paths, jobs, debug, mmap, functionJobs, stream, history, profilePath is not None, myCache)
+    else:
+        results = (decompile(path, debug, mmap, functionJobs, stream, history, profilePath is not None, myCache) for path in paths)
+
+    allStats = []
+    # Profile of all files:
+    profile = profiler.Profile()
+    for path, pathFailed, pathSucceeded, pathStats, pathProfile in results:
+        if pathFailed:
+            failed.append(path)
+        if pathSucceeded:
+            success.append(path)
+        allStats.append((path, pathStats))
+        if pathProfile is not None:
+            profile.merge(pathProfile)
+
+    # Report in order of input, whatever order files were completed in:
+    order = { path: idx for idx, path in enumerate(paths) }
+
+    if failed:
+        logging.info("The following failed to be decompiled fully:")
+        for path in sorted(failed, key=order.get):
+            logging.info(str(path))
+
+    if statsPath is not None:
+        files = [ pathStats for path, pathStats in sorted(allStats, key=lambda item: order[item[0]]) ]
+        total = stats.aggregate(files)
+        try:
+            with open(statsPath, "w") as fd:
+                json.dump({"files": files, "aggregate": total}, fd, indent=4)
+        except Exception as e:
+            logging.error("Failed to write statistics: {}: Got exception: {}".format(statsPath, repr(e)))
+        else:
+            for name, stage in total["stages"].items():
+                logging.info("Stage {}: {} files in {:.3f}s wall, {:.3f}s CPU".format(name, stage["files"], stage["wall"], stage["cpu"]))
+            logging.info("Statistics stored in: {}".format(statsPath))
+
+    if profilePath is not None:
+        try:
+            with open(profilePath, "w", newline="") as fd:
+                if profilePath.endswith(".csv"):
+                    profile.toCsv(fd)
+                else:
+                    profile.toJson(fd)
+        except Exception as e:
+            logging.error("Failed to write profile: {}: Got exception: {}".format(profilePath, repr(e)))
+        else:
+            for row in profile.rows()[:5]:
+                logging.info("Opcode {}: {} calls in {:.3f}s ({:.1%})".format(row["name"], row["count"], row["time"], row["share"]))
+            logging.info("Profile stored in: {}".format(profilePath))
+
+    if myCache is not None:
+        try:
+            myCache.evict()
+        except Exception as e:
+            logging.warning("Failed to evict entries from cache: {}: Got exception: {}".format(myCache.path, repr(e)))
+
+    logging.info("Fully decompiled {} out of {} input files".format(len(success), len(fnames)))
 
-    for path in failed:
-        logging.info(str(path))
 
-logging.info("Fully decompiled {} out of {} input files".format(len(success), len(fnames)))
+if __name__ == "__main__":
+    main()
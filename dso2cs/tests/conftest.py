@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.generator import generate
+
+'''
+Synthetic files the tests run on, as parameters of generator.generate by name. The large one has enough strings for offsets
+to need extension control codes
+'''
+cases = {
+    "small":    {"functions": 5,  "objects": 3, "strings": 50,   "depth": 3},
+    "large":    {"functions": 20, "objects": 5, "strings": 1000, "depth": 4},
+}
+
+'''
+Generates the synthetic files, once for all tests
+@return dict    Paths of files by case name
+'''
+@pytest.fixture(scope="session")
+def paths(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("dso")
+
+    paths = {}
+    for name, params in cases.items():
+        path = directory / (name + ".cs.dso")
+        path.write_bytes(generate(**params))
+        paths[name] = path
+
+    return paths
+
+'''
+Each synthetic file in turn
+@return Path    Path of file
+'''
+@pytest.fixture(params=list(cases))
+def path(request, paths):
+    return paths[request.param]
@@ -0,0 +1,28 @@
+from core import cache
+
+
+def testKeyDependsOnNameAndContent(path):
+    myCache = cache.Cache()
+    data = path.read_bytes()
+
+    key = myCache.key(path.name, data)
+    assert key == myCache.key(path.name, data)
+    # Decompiled files start with their name, so the same content under another name is another entry:
+    assert key != myCache.key("other.cs.dso", data)
+    assert key != myCache.key(path.name, data + b"\x00")
+
+def testPutAndGet(tmp_path, path):
+    myCache = cache.Cache(tmp_path)
+    key = myCache.key(path.name, path.read_bytes())
+
+    assert myCache.get(key) is None
+    myCache.put(key, b"output")
+    assert myCache.get(key) == b"output"
+
+def testEvictBySize(tmp_path):
+    myCache = cache.Cache(tmp_path, maxSize=10)
+    for name in ["a", "b", "c"]:
+        myCache.put(myCache.key(name, b""), b"12345678")
+
+    assert myCache.evict() == 2
+    assert len(list(tmp_path.glob("*/*.cs"))) == 1
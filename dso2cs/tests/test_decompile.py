@@ -0,0 +1,75 @@
+from io import StringIO
+
+from core import dso, codec, parallel, profiler
+
+'''
+Decompiles a file into a string, the way dso2cs.decompile does
+@param  path            Path of file
+@param  mmap            Memory map file instead of reading it (default False)
+@param  functionJobs    Number of worker processes to decode functions in (default None, decodes serially)
+@param  stream          Format functions as soon as they are decoded (default False)
+@param  profile         profiler.Profile to decode with (default None, does not profile)
+@return string          Decompiled file
+'''
+def decompile(path, mmap=False, functionJobs=None, stream=False, profile=None):
+    myFile = dso.File(path, mmap=mmap)
+    myFile.parse()
+
+    sink = StringIO()
+    if functionJobs:
+        decoder = parallel.ParallelDecoding(myFile, functionJobs, stream=sink if stream else None, profile=profile)
+    else:
+        decoder = codec.Decoding(myFile, stream=sink if stream else None, profile=profile)
+    decoder.decode()
+
+    decoder.tree.rewind()
+    if stream:
+        decoder.tree.flush(sink=sink)
+    else:
+        decoder.tree.format(sink=sink)
+
+    myFile.close()
+
+    return sink.getvalue()
+
+
+def testDecompiles(path):
+    output = decompile(path)
+
+    assert output.startswith("// Decompiled file: {};\n".format(path.name))
+    assert "function NS1::fn1(%x, %y)\n" in output
+    assert "datablock " in output or "new " in output
+
+def testMmapOutputIsIdentical(path):
+    assert decompile(path, mmap=True) == decompile(path)
+
+def testParallelOutputIsIdentical(path):
+    assert decompile(path, functionJobs=2) == decompile(path)
+
+def testStreamedOutputIsIdentical(path):
+    assert decompile(path, stream=True) == decompile(path)
+
+def testParallelStreamedOutputIsIdentical(path):
+    assert decompile(path, functionJobs=2, stream=True) == decompile(path)
+
+def testParallelInstructionCount(path):
+    counts = []
+    for decoding in [codec.Decoding, lambda myFile: parallel.ParallelDecoding(myFile, 2)]:
+        myFile = dso.File(path)
+        myFile.parse()
+
+        decoder = decoding(myFile)
+        decoder.decode()
+        counts.append(decoder.getInstructionCount())
+
+    assert counts[0] > 0 and counts[0] == counts[1]
+
+def testProfiledOutputIsIdentical(path):
+    profile = profiler.Profile()
+    assert decompile(path, profile=profile) == decompile(path)
+    assert sum(entry["count"] for entry in profile.values()) > 0
+
+def testParallelProfiledOutputIsIdentical(path):
+    profile = profiler.Profile()
+    assert decompile(path, functionJobs=2, profile=profile) == decompile(path)
+    assert sum(entry["count"] for entry in profile.values()) > 0
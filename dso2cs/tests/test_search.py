@@ -0,0 +1,23 @@
+from core import search
+
+
+def testLiteralHits(path):
+    hits = search.searchFile(path, search.compilePattern("$pad7"), ["global"])
+
+    assert ("$pad7" in [ string for table, offset, string in hits ])
+    assert all(table == "global" and "$pad7" in string for table, offset, string in hits)
+
+def testRegexIgnoringCase(path):
+    hits = search.searchFile(path, search.compilePattern("^HELLO [0-9]$", regex=True, ignoreCase=True), ["function"])
+
+    assert hits
+    assert all(table == "function" and string.startswith("hello ") for table, offset, string in hits)
+
+def testNoHitsInOtherTable(path):
+    assert not search.searchFile(path, search.compilePattern("$pad"), ["function"])
+
+def testWalk(paths, tmp_path):
+    (tmp_path / "other.txt").write_text("")
+
+    directory = next(iter(paths.values())).parent
+    assert list(search.walk([directory, tmp_path])) == sorted(paths.values())
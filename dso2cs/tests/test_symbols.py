@@ -0,0 +1,32 @@
+from core import symbols
+
+
+def testScan(path):
+    functions, calls = symbols.scanFile(path)
+
+    assert [ (name, namespace) for name, namespace, package, argc, start, end in functions ][:2] == [("fn0", ""), ("fn1", "NS1")]
+    assert all(argc == 2 and start < end for name, namespace, package, argc, start, end in functions)
+    # Calls made inside functions know their caller, the one made at top level does not:
+    assert ("fn0", "", "Function") in [ (name, namespace, callType) for name, namespace, callType, ip, caller in calls
+        if caller is None ]
+    assert any(caller is not None for name, namespace, callType, ip, caller in calls)
+
+def testIndex(tmp_path, path):
+    myIndex = symbols.Index(tmp_path / "symbols.sqlite")
+
+    hash = symbols.getHash(path.read_bytes())
+    assert not myIndex.isCurrent(path, hash)
+
+    myIndex.update(path, hash, *symbols.scanFile(path))
+    assert myIndex.isCurrent(path, hash)
+
+    # Names are compared regardless of case:
+    declarations = myIndex.getDeclarations("FN1", "ns1")
+    assert [ (str(row[0]), row[1], row[2]) for row in declarations ] == [(str(path), "NS1", "fn1")]
+
+    calls = myIndex.getCalls("fn0")
+    assert [ (row[3], row[5], row[6]) for row in calls ] == [("Function", None, None)]
+
+    assert myIndex.count()["files"] == 1
+    assert myIndex.prune() == 0
+    myIndex.close()